@@ -1,24 +1,95 @@
 import os
 import re
+import copy
 import json
+import inspect
+import functools
+import contextlib
 import torch
 import librosa
 import soundfile
 import torchaudio
 import numpy as np
 import torch.nn as nn
+from torch.nn.utils.weight_norm import WeightNorm
 from tqdm import tqdm
 import torch
 
 from dmtts.utils import hparam_utils as utils
 from dmtts.model import commons
 from dmtts.model.synthesizer import SynthesizerTrn
+from dmtts.model.quantization import quantize_dynamic_int8
 from dmtts.utils.split_utils import split_sentence
+from dmtts.utils.audio_utils import WavStreamWriter
+from dmtts.utils.profile_utils import InferenceProfile, ProfileSampler, current_profile, stage
 from dmtts.utils.download_utils import load_or_download_config, load_or_download_model
+from dmtts.model.text.symbols import get_encoder
+from dmtts.model.text.cleaner import configure_g2p_cache
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# duration_mode -> sdp_ratio; "blend" keeps the caller's sdp_ratio. The pure modes
+# evaluate a single duration predictor (see SynthesizerTrn.infer_latent).
+DURATION_MODES = {"blend": None, "deterministic": 0.0, "stochastic": 1.0}
+
+def resolve_sdp_ratio(duration_mode, sdp_ratio):
+    if duration_mode is None:
+        return sdp_ratio
+    if duration_mode not in DURATION_MODES:
+        raise ValueError(f"unknown duration_mode: {duration_mode} (expected one of {tuple(DURATION_MODES)})")
+    ratio = DURATION_MODES[duration_mode]
+    return sdp_ratio if ratio is None else ratio
+
+def resolve_device(device):
+    """"auto" -> mps, else cuda, else cpu; any other device is returned as is."""
+    if device == 'auto':
+        device = 'cpu'
+        if torch.cuda.is_available(): device = 'cuda'
+        if torch.backends.mps.is_available(): device = 'mps'
+    return device
+
+PRECISIONS = {"fp32": torch.float32, "bf16": torch.bfloat16, "fp16": torch.float16}
+
+def resolve_precision(precision, device):
+    """"fp32" / "bf16" / "fp16", or "auto": bf16 where the device supports it,
+    else fp16 on GPUs and fp32 on CPUs."""
+    if precision == "auto":
+        if "cuda" in device:
+            precision = "bf16" if torch.cuda.is_bf16_supported() else "fp16"
+        elif device == "mps":
+            precision = "fp16"
+        else:
+            try:
+                bf16 = torch.backends.mkldnn.is_available() and torch.ops.mkldnn._is_mkldnn_bf16_supported()
+            except (AttributeError, RuntimeError):
+                bf16 = False
+            precision = "bf16" if bf16 else "fp32"
+    if precision not in PRECISIONS:
+        raise ValueError(f"unknown precision: {precision} (expected 'auto' or one of {tuple(PRECISIONS)})")
+    return PRECISIONS[precision]
+
+def sampled_profile(fn):
+    """Runs `fn` under the sampling profiler set by `TTS.enable_profiling`
+    (generators step by step, see `ProfileSampler.profile_iter`)."""
+    if inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def generator_wrapper(self, *args, **kwargs):
+            if self._profiler is None:
+                return (yield from fn(self, *args, **kwargs))
+            return (yield from self._profiler.profile_iter(fn(self, *args, **kwargs)))
+        return generator_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        if self._profiler is None:
+            return fn(self, *args, **kwargs)
+        with self._profiler.maybe_profile():
+            return fn(self, *args, **kwargs)
+    return wrapper
+
 class TTS(nn.Module):
+    _profiler = None
+
     def __init__(self, 
                 language, # lang_list를 받아도 됨
                 device='auto',
@@ -27,15 +98,20 @@ class TTS(nn.Module):
                 ckpt_path=None,
                 local_repo_path_dict=None,
                 skip_snap_seed=True,
+                quantize=None,
+                precision="fp32",
+                g2p_cache_size=None,
+                g2p_cache_path=None,
                 ):
         super().__init__()
-        if device == 'auto':
-            device = 'cpu'
-            if torch.cuda.is_available(): device = 'cuda'
-            if torch.backends.mps.is_available(): device = 'mps'
+        device = resolve_device(device)
         if 'cuda' in device:
             assert torch.cuda.is_available()
 
+        if g2p_cache_size is not None or g2p_cache_path is not None:
+            # process-wide: the g2p cache is shared by every TTS instance
+            configure_g2p_cache(maxsize=g2p_cache_size, path=g2p_cache_path)
+
         hps = load_or_download_config(language, use_hf=use_hf, config_path=config_path, local_repo_path_dict=local_repo_path_dict, skip_snap_seed=skip_snap_seed)
 
         num_languages = hps.num_languages
@@ -43,33 +119,137 @@ class TTS(nn.Module):
         symbols = hps.symbols
         lang_list = hps.data.lang_list
 
-        model = SynthesizerTrn(
-            len(symbols),
-            hps.data.filter_length // 2 + 1,
-            hps.train.segment_size // hps.data.hop_length,
-            n_speakers=hps.data.n_speakers,
-            num_tones=num_tones,
-            num_languages=num_languages,
-            lang_list= lang_list,
-            **hps.model,
-        ).to(device)
+        # load state_dict: parameter
+        checkpoint_dict = load_or_download_model(language, device, use_hf=use_hf, ckpt_path=ckpt_path,local_repo_path_dict=local_repo_path_dict,skip_snap_seed=skip_snap_seed)
+        inference_only = checkpoint_dict.get('inference_only', False)
+
+        # inference-only (safetensors) checkpoints are memory-mapped: build the model
+        # on the meta device (nothing allocated or initialized) and point its
+        # parameters at the mapped tensors
+        with torch.device("meta") if inference_only else contextlib.nullcontext():
+            model = SynthesizerTrn(
+                len(symbols),
+                hps.data.filter_length // 2 + 1,
+                hps.train.segment_size // hps.data.hop_length,
+                n_speakers=hps.data.n_speakers,
+                num_tones=num_tones,
+                num_languages=num_languages,
+                lang_list= lang_list,
+                **hps.model,
+            )
+
+        if inference_only:
+            missing, unexpected = model.load_state_dict(checkpoint_dict['model'], strict=False, assign=True)
+            missing = [k for k in missing if not k.startswith('enc_q.')]
+            if missing or unexpected:
+                raise RuntimeError(f"Inference checkpoint does not match the model config: missing {missing}, unexpected {unexpected}")
+            model.enc_q = None # training-only, not exported
+        else:
+            model.load_state_dict(checkpoint_dict['model'], strict=True)
+        del checkpoint_dict
 
+        dtype = resolve_precision(precision, device)
+        if dtype != torch.float32:
+            if quantize is not None:
+                raise ValueError("quantize and a reduced precision are mutually exclusive")
+            # weight norm is folded in the stored precision, then every weight is kept
+            # once in reduced precision; inference runs under autocast (see `autocast`)
+            model.optimize_for_inference()
+        # a no-op (no copy of the mapped weights) when the checkpoint is stored in `dtype`
+        model = model.to(dtype)
+        model = model.to(device)
         model.eval()
+        if quantize is not None:
+            # CPU only: dynamic int8 for the encoder, duration predictors and flow,
+            # see dmtts.model.quantization
+            if quantize != "int8":
+                raise ValueError(f"unknown quantize mode: {quantize} (expected 'int8')")
+            if device != "cpu":
+                raise ValueError(f"quantize='int8' runs on CPU only, got device={device}")
+            quantize_dynamic_int8(model.optimize_for_inference())
+        self.quantize = quantize
+        self.dtype = dtype
         self.model = model
         self.symbol_to_id = {s: i for i, s in enumerate(symbols)}
+        # phone ids come from the lang_list tables (as in training), not hps.symbols
+        self.text_encoder = get_encoder(lang_list)
         self.hps = hps
         self.device = device
     
-        # load state_dict: parameter
-        checkpoint_dict = load_or_download_model(language, device, use_hf=use_hf, ckpt_path=ckpt_path,local_repo_path_dict=local_repo_path_dict,skip_snap_seed=skip_snap_seed)
-        self.model.load_state_dict(checkpoint_dict['model'], strict=True)
-        
         language = language.split('_')[0] # for multi-lingual: FUTURE WORK
         self.language = language 
         
         
         
         self.lang_list= lang_list
+
+    def profile(self, synchronize=False):
+        """
+        Records per-stage / per-sentence timings of every call made inside the block:
+
+            with tts.profile() as prof:
+                tts.tts_to_file(text, speaker_id, "out.wav")
+            prof.as_dict()  # or prof.log()
+        """
+        return InferenceProfile(self.hps.data.sampling_rate, synchronize=synchronize).activate()
+
+    def enable_profiling(self, sample_rate=1.0, callback=None, synchronize=False):
+        """Profile a random `sample_rate` fraction of inference calls (`tts_to_file`,
+        `tts_stream`, `infer_padded`, ...; nested calls join the outer profile);
+        each profile dict goes to `callback`, or to the log if None."""
+        self._profiler = ProfileSampler(self.hps.data.sampling_rate, sample_rate=sample_rate, callback=callback, synchronize=synchronize)
+
+    def disable_profiling(self):
+        self._profiler = None
+
+    def autocast(self):
+        """Context the model runs in: autocast to `self.dtype` for reduced precision.
+        The duration path, generate_path and the splines stay in fp32 inside the model."""
+        if self.dtype == torch.float32:
+            return contextlib.nullcontext()
+        return torch.autocast(torch.device(self.device).type, dtype=self.dtype)
+
+    @torch.no_grad()
+    def _probe(self, model, n_phones=40, seed=1234):
+        """Output of `model` for a fixed synthetic input, without touching the global RNG."""
+        generator = torch.Generator().manual_seed(seed)
+        x = torch.randint(1, len(self.symbol_to_id), (1, n_phones), generator=generator).to(self.device)
+        y = None
+        if model.n_speakers <= 0:  # reference-encoder model: g comes from a spectrogram
+            y = torch.randn(1, model.spec_channels, 4 * n_phones, generator=generator).to(self.device)
+        with torch.random.fork_rng(devices=[] if not torch.cuda.is_available() else None), self.autocast():
+            torch.manual_seed(seed)
+            o = model.infer(x, torch.LongTensor([n_phones]).to(self.device), torch.LongTensor([0]).to(self.device),
+                            torch.zeros_like(x), torch.zeros_like(x), sdp_ratio=0.2, y=y)[0]
+        return o
+
+    def optimize_for_inference(self, check=True, atol=1e-3):
+        """
+        Applies `SynthesizerTrn.optimize_for_inference` (weight norm folding, fused
+        q / k / v projections, no dropout, no posterior encoder). With `check` the
+        optimized copy must reproduce the current model's output on a probe input
+        to within `atol`, otherwise RuntimeError is raised and the model is left
+        untouched. Idempotent.
+        """
+        if self.model._inference_optimized:
+            return self
+        if not check:
+            self.model.optimize_for_inference()
+            return self
+        # weight norm caches its last weight with autograd history, which deepcopy rejects
+        with torch.no_grad():
+            for module in self.model.modules():
+                for hook in module._forward_pre_hooks.values():
+                    if isinstance(hook, WeightNorm):
+                        setattr(module, hook.name, hook.compute_weight(module))
+        optimized = copy.deepcopy(self.model).optimize_for_inference()
+        reference, output = self._probe(self.model), self._probe(optimized)
+        diff = (reference - output).abs().max().item() if reference.shape == output.shape else float("inf")
+        if not diff <= atol:
+            raise RuntimeError(f"optimize_for_inference changed the output (max abs diff {diff:.3g} > {atol})")
+        self.model = optimized
+        return self
+
     @staticmethod
     def audio_numpy_concat(segment_data_list, sr, speed=1.):
         audio_segments = []
@@ -82,20 +262,121 @@ class TTS(nn.Module):
     @staticmethod
     def split_sentences_into_pieces(text, language, quiet=False):
         # print(f"def split_senteces in to piees: {text}")
-        texts = split_sentence(text, language_str=language)
+        with stage("split_sentence"):
+            texts = split_sentence(text, language_str=language)
         if not quiet:
             print(" > Text split to sentences.")
             print('\n'.join(texts))
             print(" > ===========================")
         return texts
 
+    @sampled_profile
+    def infer_sentence(self, t, speaker_id, sdp_ratio=0.2, noise_scale=0.6, noise_scale_w=0.8, speed=1.0):
+        device = self.device
+        phones, tones, lang_ids = self.get_text_inputs(t)
+
+        profile = current_profile()
+        records = profile.take_pending(1) if profile is not None else None
+        handle = profile.begin_model(records) if records else None
+        with torch.no_grad(), self.autocast():
+            x_tst = phones.to(device).unsqueeze(0)
+            tones = tones.to(device).unsqueeze(0)
+            lang_ids = lang_ids.to(device).unsqueeze(0)
+
+            x_tst_lengths = torch.LongTensor([phones.size(0)]).to(device)
+            del phones
+            speakers = torch.LongTensor([speaker_id]).to(device)
+            o, _, y_mask, _ = self.model.infer(
+                    x_tst,
+                    x_tst_lengths,
+                    speakers,
+                    tones,
+                    lang_ids,
+                    sdp_ratio=sdp_ratio,
+                    noise_scale=noise_scale,
+                    noise_scale_w=noise_scale_w,
+                    length_scale=1. / speed,
+                    g=self.model.speaker_condition([speaker_id]),
+                )
+            audio = o[0, 0].data.cpu().float().numpy()
+            if handle is not None:
+                profile.end_model(handle, records, [y_mask.sum().item()], [audio.shape[-1]])
+            del x_tst, tones, lang_ids, x_tst_lengths, speakers, o, y_mask
+        return audio
+
+    @staticmethod
+    def pad_batch(seqs):
+        lengths = torch.LongTensor([seq.size(0) for seq in seqs])
+        padded = torch.zeros(len(seqs), int(lengths.max()), dtype=torch.long)
+        for i, seq in enumerate(seqs):
+            padded[i, : seq.size(0)] = seq
+        return padded, lengths
+
+    def get_text_inputs(self, t):
+        """Text frontend for one sentence: returns (phones, tones, lang_ids) LongTensors."""
+        profile = current_profile()
+        record = profile.begin_sentence(t) if profile is not None else None
+        language = self.language
+        if language in ['EN', 'ZH_MIX_EN']:
+            t = re.sub(r'([a-z])([A-Z])', r'\1 \2', t)
+        inputs = utils.get_text_for_tts_infer(t, language, self.hps, self.device, self.lang_list, encoder=self.text_encoder)
+        if record is not None:
+            profile.end_frontend(record, inputs[0].size(0))
+        return inputs
+
+    @sampled_profile
+    def infer_padded(self, inputs, speaker_ids, sdp_ratio=0.2, noise_scale=0.6, noise_scale_w=0.8, speed=1.0):
+        """Run one padded `infer` call over a list of `get_text_inputs` results
+        (one speaker id per row) and cut each waveform back out with `y_mask`."""
+        device = self.device
+        profile = current_profile()
+        records = profile.take_pending(len(inputs), [phones.size(0) for phones, _, _ in inputs]) if profile is not None else None
+        handle = profile.begin_model(records) if records else None
+        with torch.no_grad(), self.autocast():
+            x_tst, x_tst_lengths = self.pad_batch([phones for phones, _, _ in inputs])
+            tones, _ = self.pad_batch([tones for _, tones, _ in inputs])
+            lang_ids, _ = self.pad_batch([lang_ids for _, _, lang_ids in inputs])
+            speakers = torch.LongTensor(speaker_ids).to(device)
+            o, _, y_mask, _ = self.model.infer(
+                    x_tst.to(device),
+                    x_tst_lengths.to(device),
+                    speakers,
+                    tones.to(device),
+                    lang_ids.to(device),
+                    sdp_ratio=sdp_ratio,
+                    noise_scale=noise_scale,
+                    noise_scale_w=noise_scale_w,
+                    length_scale=1. / speed,
+                    g=self.model.speaker_condition(speaker_ids),
+                )
+            frames = y_mask.sum([1, 2]).long()
+            audio_lengths = (frames * self.hps.data.hop_length).tolist()
+            o = o[:, 0].data.cpu().float().numpy()
+            if handle is not None:
+                profile.end_model(handle, records, frames.tolist(), audio_lengths)
+            del x_tst, tones, lang_ids, x_tst_lengths, speakers, y_mask
+        return [o[i, :n] for i, n in enumerate(audio_lengths)]
+
+    @sampled_profile
+    def infer_batch(self, texts, speaker_id, sdp_ratio=0.2, noise_scale=0.6, noise_scale_w=0.8, speed=1.0):
+        """Synthesize several sentences with one padded `infer` call.
+        Returns one float32 waveform per sentence, identical (up to float error)
+        to running them one by one in the same order with the same seed."""
+        inputs = [self.get_text_inputs(t) for t in texts]
+        return self.infer_padded(inputs, [speaker_id] * len(texts), sdp_ratio=sdp_ratio, noise_scale=noise_scale, noise_scale_w=noise_scale_w, speed=speed)
+
     ## inference
-    def tts_to_file(self, text, speaker_id, output_path=None, sdp_ratio=0.2, noise_scale=0.6, noise_scale_w=0.8, speed=1.0, pbar=None, format=None, position=None, quiet=False,):
+    @sampled_profile
+    def tts_to_file(self, text, speaker_id, output_path=None, sdp_ratio=0.2, noise_scale=0.6, noise_scale_w=0.8, speed=1.0, pbar=None, format=None, position=None, quiet=False, batch_size=1, duration_mode=None,):
+        sdp_ratio = resolve_sdp_ratio(duration_mode, sdp_ratio)
         language = self.language
         texts = self.split_sentences_into_pieces(text, language, quiet)
         #print("HIHIHIHIHHIHHIHIH")
         print(f"tts_to_file input text: {texts}")
         audio_list = []
+        if batch_size > 1:
+            # consecutive groups keep the noise draws in sentence order (same as serial)
+            texts = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
         if pbar:
             tx = pbar(texts)
         else:
@@ -106,8 +387,9 @@ class TTS(nn.Module):
             else:
                 tx = tqdm(texts)
         for t in tx:
-            if language in ['EN', 'ZH_MIX_EN']:
-                t = re.sub(r'([a-z])([A-Z])', r'\1 \2', t)
+            if batch_size > 1:
+                audio_list += self.infer_batch(t, speaker_id, sdp_ratio=sdp_ratio, noise_scale=noise_scale, noise_scale_w=noise_scale_w, speed=speed)
+                continue
             ################################################################
             # if language in ['JP']:
             #     t = t.strip()
@@ -123,18 +405,37 @@ class TTS(nn.Module):
             #         audio_list.append(np.zeros(int(sr * 0.05), dtype=np.float32))
             #         continue
             ################################################################
-            device = self.device
-            phones, tones, lang_ids = utils.get_text_for_tts_infer(t, language, self.hps, device, self.lang_list)
+            audio = self.infer_sentence(t, speaker_id, sdp_ratio=sdp_ratio, noise_scale=noise_scale, noise_scale_w=noise_scale_w, speed=speed)
+            audio_list.append(audio)
+        torch.cuda.empty_cache()
+        audio = self.audio_numpy_concat(audio_list, sr=self.hps.data.sampling_rate, speed=speed)
 
-            with torch.no_grad():
+        if output_path is None:
+            return audio
+        else:
+            if format:
+                soundfile.write(output_path, audio, self.hps.data.sampling_rate, format=format)
+            else:
+                soundfile.write(output_path, audio, self.hps.data.sampling_rate)
+
+    @sampled_profile
+    def infer_sentence_stream(self, t, speaker_id, sdp_ratio=0.2, noise_scale=0.6, noise_scale_w=0.8, speed=1.0, chunk_size=32):
+        """Like `infer_sentence`, but yields the vocoder output every `chunk_size` frames."""
+        device = self.device
+        phones, tones, lang_ids = self.get_text_inputs(t)
+
+        profile = current_profile()
+        records = profile.take_pending(1) if profile is not None else None
+        handle = profile.begin_model(records) if records else None
+        samples = 0
+        try:
+            with torch.no_grad(), self.autocast():
                 x_tst = phones.to(device).unsqueeze(0)
                 tones = tones.to(device).unsqueeze(0)
                 lang_ids = lang_ids.to(device).unsqueeze(0)
-
                 x_tst_lengths = torch.LongTensor([phones.size(0)]).to(device)
-                del phones
                 speakers = torch.LongTensor([speaker_id]).to(device)
-                audio = self.model.infer(
+                for o in self.model.infer_stream(
                         x_tst,
                         x_tst_lengths,
                         speakers,
@@ -144,18 +445,40 @@ class TTS(nn.Module):
                         noise_scale=noise_scale,
                         noise_scale_w=noise_scale_w,
                         length_scale=1. / speed,
-                    )[0][0, 0].data.cpu().float().numpy()
-                del x_tst, tones, lang_ids, x_tst_lengths, speakers
-
+                        g=self.model.speaker_condition([speaker_id]),
+                        chunk_size=chunk_size,
+                    ):
+                    audio = o[0, 0].data.cpu().float().numpy()
+                    samples += audio.shape[-1]
+                    yield audio
+        finally:
+            # also when the consumer abandons the stream: the record covers what was produced
+            if handle is not None:
+                profile.end_model(handle, records, [samples // self.hps.data.hop_length], [samples])
 
-            audio_list.append(audio)
-        torch.cuda.empty_cache()
-        audio = self.audio_numpy_concat(audio_list, sr=self.hps.data.sampling_rate, speed=speed)
+    @sampled_profile
+    def tts_stream(self, text, speaker_id, sdp_ratio=0.2, noise_scale=0.6, noise_scale_w=0.8, speed=1.0, quiet=True, chunk_size=None, duration_mode=None):
+        """Yield float32 audio as soon as it is synthesized. By default one chunk per
+        sentence (ending with the 50 ms pause); with `chunk_size` (latent frames) the
+        vocoder output is streamed within sentences too and the pause is its own chunk.
+        Either way the concatenated stream equals `tts_to_file` for the same seed."""
+        sdp_ratio = resolve_sdp_ratio(duration_mode, sdp_ratio)
+        texts = self.split_sentences_into_pieces(text, self.language, quiet)
+        silence = np.zeros(int((self.hps.data.sampling_rate * 0.05) / speed), dtype=np.float32)
+        for t in texts:
+            if chunk_size:
+                for chunk in self.infer_sentence_stream(t, speaker_id, sdp_ratio=sdp_ratio, noise_scale=noise_scale, noise_scale_w=noise_scale_w, speed=speed, chunk_size=chunk_size):
+                    yield chunk
+                yield silence
+                continue
+            audio = self.infer_sentence(t, speaker_id, sdp_ratio=sdp_ratio, noise_scale=noise_scale, noise_scale_w=noise_scale_w, speed=speed)
+            yield np.concatenate([audio.reshape(-1).astype(np.float32), silence])
 
-        if output_path is None:
-            return audio
-        else:
-            if format:
-                soundfile.write(output_path, audio, self.hps.data.sampling_rate, format=format)
-            else:
-                soundfile.write(output_path, audio, self.hps.data.sampling_rate)
+    @sampled_profile
+    def tts_stream_to_file(self, text, speaker_id, output, subtype="PCM_16", **kwargs):
+        """Write `tts_stream` incrementally as WAV to a path or binary file-like
+        object (socket, pipe, BytesIO). Returns the number of samples written."""
+        with WavStreamWriter(output, self.hps.data.sampling_rate, subtype=subtype) as writer:
+            for chunk in self.tts_stream(text, speaker_id, **kwargs):
+                writer.write(chunk)
+        return writer.num_samples
@@ -4,21 +4,19 @@ import gradio as gr
 import os, torch, io
 # os.system('python -m unidic download')
 print("Make sure you've downloaded unidic (python -m unidic download) for this WebUI to work.")
-from dmtts.app.api import TTS
+from dmtts.app.registry import ModelRegistry
 speed = 1.0
 import tempfile
 import click
 device = 'auto'
-models = {
-    'VI': TTS(language='VI', device=device),
-    'EN': TTS(language='EN', device=device),
-    'ES': TTS(language='ES', device=device),
-    'FR': TTS(language='FR', device=device),
-    'ZH': TTS(language='ZH', device=device),
-    'JP': TTS(language='JP', device=device),
-    'KR': TTS(language='KR', device=device),
-}
-speaker_ids = models['VI'].hps.data.spk2id
+# models are loaded on first use and the least recently used ones evicted
+models = ModelRegistry(
+    languages=['VI', 'EN', 'ZH', 'JP', 'KR', 'TH', 'RU'],
+    max_models=int(os.environ.get('DMTTS_MAX_MODELS', 3)),
+    pinned=['VI'],
+    device=device,
+)
+speaker_ids = models.get('VI').hps.data.spk2id
 
 default_text_dict = {
     "EN": "Did you ever hear a folk tale about a giant turtle?",
@@ -31,14 +29,16 @@ default_text_dict = {
     
 def synthesize(speaker, text, speed, language, progress=gr.Progress()):
     bio = io.BytesIO()
-    models[language].tts_to_file(text, models[language].hps.data.spk2id[speaker], bio, speed=speed, pbar=progress.tqdm, format='wav')
+    model = models.get(language)
+    model.tts_to_file(text, model.hps.data.spk2id[speaker], bio, speed=speed, pbar=progress.tqdm, format='wav')
     return bio.getvalue()
 def load_speakers(language, text):
     if text in list(default_text_dict.values()):
         newtext = default_text_dict[language]
     else:
         newtext = text
-    return gr.update(value=list(models[language].hps.data.spk2id.keys())[0], choices=list(models[language].hps.data.spk2id.keys())), newtext
+    spk2id = models.get(language).hps.data.spk2id
+    return gr.update(value=list(spk2id.keys())[0], choices=list(spk2id.keys())), newtext
 with gr.Blocks() as demo:
     gr.Markdown('# DMTTS WebUI\n\nA WebUI for DMTTS.')
     with gr.Group():
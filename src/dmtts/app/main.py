@@ -11,7 +11,13 @@ import os
 @click.option('--speaker', '-spk', default='EN-Default', help='Speaker ID, only for English, leave empty for default, ignored if not English. If English, defaults to "EN-Default"', type=click.Choice(['EN-Default', 'EN-US', 'EN-BR', 'EN_INDIA', 'EN-AU']))
 @click.option('--speed', '-s', default=1.0, help='Speed, defaults to 1.0', type=float)
 @click.option('--device', '-d', default='auto', help='Device, defaults to auto')
-def main(text, file, output_path, language, speaker, speed, device):
+@click.option('--sdp-ratio', default=0.2, help='Weight of the stochastic duration predictor, defaults to 0.2', type=float)
+@click.option('--duration-mode', default='blend', help='deterministic / stochastic run a single duration predictor (faster), blend mixes both by --sdp-ratio', type=click.Choice(['blend', 'deterministic', 'stochastic']))
+@click.option('--quantize', default=None, help='int8: dynamic int8 quantization (CPU only)', type=click.Choice(['int8']))
+@click.option('--precision', default='fp32', help='Weights / compute precision; auto picks bf16 where supported', type=click.Choice(['fp32', 'bf16', 'fp16', 'auto']))
+@click.option('--g2p-cache-size', default=None, help='Entries of the g2p cache (0 disables it)', type=int)
+@click.option('--g2p-cache-file', default=None, help='g2p cache preloaded from / saved back to this JSON file')
+def main(text, file, output_path, language, speaker, speed, device, sdp_ratio, duration_mode, quantize, precision, g2p_cache_size, g2p_cache_file):
     if file:
         if not os.path.exists(text):
             raise FileNotFoundError(f'Trying to load text from file due to --file/-f flag, but file not found. Remove the --file/-f flag to pass a string.')
@@ -26,11 +32,14 @@ def main(text, file, output_path, language, speaker, speed, device):
     if (not language == 'EN') and speaker:
         warnings.warn('You specified a speaker but the language is English.')
     from dmtts.app.api import TTS
-    model = TTS(language=language, device=device)
+    model = TTS(language=language, device=device, quantize=quantize, precision=precision, g2p_cache_size=g2p_cache_size, g2p_cache_path=g2p_cache_file)
     speaker_ids = model.hps.data.spk2id
     if language == 'EN':
         if not speaker: speaker = 'EN-Default'
         spkr = speaker_ids[speaker]
     else:
         spkr = speaker_ids[list(speaker_ids.keys())[0]]
-    model.tts_to_file(text, spkr, output_path, speed=speed)
+    model.tts_to_file(text, spkr, output_path, speed=speed, sdp_ratio=sdp_ratio, duration_mode=duration_mode)
+    if g2p_cache_file:
+        from dmtts.model.text.cleaner import g2p_cache
+        g2p_cache.save(g2p_cache_file)
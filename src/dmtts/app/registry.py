@@ -0,0 +1,172 @@
+import gc
+import logging
+import threading
+from collections import OrderedDict
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+
+def model_nbytes(model):
+    """Resident size of a module's parameters and buffers, in bytes."""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class ModelRegistry:
+    """
+    Lazily loaded, shared `TTS` instances keyed by language.
+
+    A language's model is built on its first `get()` and reused by every later
+    caller. At most `max_models` models / `max_bytes` bytes stay resident: before
+    a load, the least recently used unpinned models are evicted to make room for
+    the new one, whose size is estimated by `estimate(language)` (default: the
+    size of the generator weights in its checkpoint if already on disk, in the
+    precision they will be kept in; or its size when it was last loaded). An
+    estimate larger than `max_bytes` on its own evicts nothing up front; the
+    budget is then enforced once the model is loaded and its real size is known. Languages in `pinned` are never evicted (and are loaded by `preload()`).
+
+    Extra keyword arguments are passed to `TTS(language=..., **tts_kwargs)`;
+    `factory(language)` can replace that constructor entirely.
+    """
+
+    def __init__(self, languages=None, max_models=None, max_bytes=None, pinned=(), factory=None, models=None, estimate=None, **tts_kwargs):
+        if factory is None:
+            def factory(language):
+                from dmtts.app.api import TTS
+                return TTS(language=language, **tts_kwargs)
+        if estimate is None:
+            def estimate(language):
+                from dmtts.app.api import resolve_device, resolve_precision
+                from dmtts.utils.download_utils import checkpoint_model_nbytes, find_checkpoint
+                keys = ("use_hf", "ckpt_path", "local_repo_path_dict", "skip_snap_seed")
+                path = find_checkpoint(language, **{k: tts_kwargs[k] for k in keys if k in tts_kwargs})
+                if path is None:
+                    return None
+                # the size the model will have once loaded, in the precision TTS keeps it in
+                device = resolve_device(tts_kwargs.get("device", "auto"))
+                dtype = resolve_precision(tts_kwargs.get("precision", "fp32"), device)
+                optimized = dtype != torch.float32 or tts_kwargs.get("quantize") is not None
+                # optimize_for_inference drops the posterior encoder
+                return checkpoint_model_nbytes(path, dtype=dtype, exclude=("enc_q.",) if optimized else ())
+        self.factory = factory
+        self.estimate = estimate
+        self.languages = list(languages) if languages is not None else None
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.pinned = set(pinned)
+
+        self._models = OrderedDict()  # language -> TTS, least recently used first
+        self._sizes = {}
+        self._last_sizes = {}  # language -> bytes when last loaded (survives eviction)
+        self._lock = threading.RLock()
+        self._load_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        for language, model in (models or {}).items():
+            self._models[language] = model
+            self._sizes[language] = model_nbytes(model)
+
+    def __contains__(self, language):
+        return self.languages is None or language in self.languages or language in self._models
+
+    def loaded(self):
+        with self._lock:
+            return list(self._models.keys())
+
+    def preload(self, languages=None):
+        for language in (languages if languages is not None else sorted(self.pinned)):
+            self.get(language)
+
+    def get(self, language):
+        with self._lock:
+            if language in self._models:
+                self.hits += 1
+                self._models.move_to_end(language)
+                return self._models[language]
+            if language not in self:
+                raise KeyError(f"language not served: {language}")
+            load_lock = self._load_locks.setdefault(language, threading.Lock())
+
+        # load outside the registry lock so other languages stay available
+        with load_lock:
+            with self._lock:
+                if language in self._models:
+                    self.hits += 1
+                    self._models.move_to_end(language)
+                    return self._models[language]
+                self.misses += 1
+            # make room first, so peak memory stays within the budget during the load
+            incoming = self._last_sizes.get(language)
+            if incoming is None:
+                incoming = self.estimate(language) or 0
+            if self.max_bytes is not None and incoming > self.max_bytes:
+                # evicting everything would not make it fit; decide on the real size
+                logger.warning(f"ModelRegistry: {language} is estimated at {incoming} bytes, over max_bytes={self.max_bytes}")
+                incoming = 0
+            with self._lock:
+                evicted = self._evict(keep=language, incoming=incoming)
+            self._release(evicted)
+            logger.info(f"ModelRegistry: loading {language}")
+            model = self.factory(language)
+            with self._lock:
+                self._models[language] = model
+                self._sizes[language] = self._last_sizes[language] = model_nbytes(model)
+                # in case the estimate was low (or skipped above)
+                evicted = self._evict(keep=language)
+            self._release(evicted)
+            return model
+
+    def unload(self, language):
+        with self._lock:
+            evicted = [model for model in [self._pop(language)] if model is not None]
+        self._release(evicted)
+
+    def _pop(self, language):
+        self._sizes.pop(language, None)
+        return self._models.pop(language, None)
+
+    @staticmethod
+    def _release(models):
+        # outside the registry lock: cache hits for other languages are not held up
+        if not models:
+            return
+        models.clear()
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def _over_budget(self, incoming=None):
+        n_models = len(self._models) + (incoming is not None)
+        if self.max_models is not None and n_models > self.max_models:
+            return True
+        n_bytes = sum(self._sizes.values()) + (incoming or 0)
+        if self.max_bytes is not None and n_bytes > self.max_bytes:
+            return True
+        return False
+
+    def _evict(self, keep, incoming=None):
+        """Pops least recently used unpinned models until the resident ones (plus an
+        `incoming` model of that many bytes) fit the budget; returns them."""
+        evicted = []
+        while self._over_budget(incoming):
+            victim = next((lang for lang in self._models if lang != keep and lang not in self.pinned), None)
+            if victim is None:
+                break
+            logger.info(f"ModelRegistry: evicting {victim}")
+            self.evictions += 1
+            evicted.append(self._pop(victim))
+        return evicted
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": list(self._models.keys()),
+                "bytes": dict(self._sizes),
+                "pinned": sorted(self.pinned),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,347 @@
+# Asyncio HTTP inference server with request micro-batching.
+#
+#   python -m dmtts.app.server -l KR -l EN --port 8000 --batch-window-ms 10
+#   python -m dmtts.app.server -l KR -l EN -l JP --max-models 2 --pin KR   # lazy load + LRU eviction
+#
+#   POST /tts      {"text": "...", "language": "KR", "speaker": "F0001", "speed": 1.0}  -> audio/wav
+#                  optional: "sdp_ratio", "noise_scale", "noise_scale_w",
+#                  "duration_mode" ("blend" | "deterministic" | "stochastic")
+#   GET  /metrics  per-request latency percentiles, batch-size histogram and g2p cache stats (JSON)
+#   GET  /health
+import io
+import json
+import time
+import asyncio
+import logging
+import functools
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+import numpy as np
+import soundfile
+
+from dmtts.app.api import TTS, resolve_sdp_ratio
+from dmtts.app.registry import ModelRegistry
+from dmtts.model.text.cleaner import configure_g2p_cache, g2p_cache
+
+logger = logging.getLogger(__name__)
+
+INFER_PARAMS = ("sdp_ratio", "noise_scale", "noise_scale_w", "speed")
+DEFAULT_PARAMS = {"sdp_ratio": 0.2, "noise_scale": 0.6, "noise_scale_w": 0.8, "speed": 1.0}
+
+
+class BatchingConfig:
+    """
+    window_ms:       how long the first queued sentence waits for company
+    max_batch_size:  max sentences per padded `infer` call
+    max_padded_len:  max rows * longest row (in phones) per call; a batch is
+                     flushed early once the queued sentences reach this size
+    """
+
+    def __init__(self, window_ms=10.0, max_batch_size=8, max_padded_len=4096):
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self.max_padded_len = max_padded_len
+
+
+class ServerMetrics:
+    def __init__(self, max_samples=10000):
+        self.latencies = collections.deque(maxlen=max_samples)
+        self.batch_sizes = collections.Counter()
+        self.num_requests = 0
+        self.num_errors = 0
+
+    def record_request(self, latency):
+        self.num_requests += 1
+        self.latencies.append(latency)
+
+    def record_batch(self, size):
+        self.batch_sizes[size] += 1
+
+    def snapshot(self):
+        latency_ms = {}
+        if self.latencies:
+            lat = np.asarray(self.latencies) * 1000.
+            latency_ms = {
+                "mean": float(lat.mean()),
+                "p50": float(np.percentile(lat, 50)),
+                "p90": float(np.percentile(lat, 90)),
+                "p99": float(np.percentile(lat, 99)),
+                "max": float(lat.max()),
+            }
+        return {
+            "requests": self.num_requests,
+            "errors": self.num_errors,
+            "latency_ms": latency_ms,
+            "batch_size_histogram": {str(k): v for k, v in sorted(self.batch_sizes.items())},
+        }
+
+
+class _Item:
+    __slots__ = ("inputs", "speaker_id", "params", "future")
+
+    def __init__(self, inputs, speaker_id, params, future):
+        self.inputs = inputs
+        self.speaker_id = speaker_id
+        self.params = params
+        self.future = future
+
+    @property
+    def length(self):
+        return self.inputs[0].size(0)
+
+
+class MicroBatcher:
+    """
+    Collects sentences submitted for one model and runs them through a single
+    padded `TTS.infer_padded` call once the window closes or the batch is full.
+    Only sentences with identical inference parameters share a call.
+
+    `get_model()` is called for every batch, so a model evicted from the
+    registry is not kept alive by its batcher.
+    """
+
+    def __init__(self, get_model, config, metrics, executor):
+        self.get_model = get_model
+        self.config = config
+        self.metrics = metrics
+        self.executor = executor
+        self.queue = asyncio.Queue()
+        self.pending = []
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, inputs, speaker_id, params):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(_Item(inputs, speaker_id, tuple(params[k] for k in INFER_PARAMS), future))
+        return await future
+
+    def _full(self):
+        padded = len(self.pending) * max(item.length for item in self.pending)
+        return len(self.pending) >= self.config.max_batch_size or padded >= self.config.max_padded_len
+
+    def _select(self):
+        key = self.pending[0].params
+        batch, rest, max_len = [], [], 0
+        for item in self.pending:
+            fits = (
+                item.params == key
+                and len(batch) < self.config.max_batch_size
+                and (len(batch) + 1) * max(max_len, item.length) <= self.config.max_padded_len
+            )
+            if fits or (not batch and item.params == key):
+                batch.append(item)
+                max_len = max(max_len, item.length)
+            else:
+                rest.append(item)
+        self.pending = rest
+        return batch
+
+    def _infer(self, *args, **kwargs):
+        return self.get_model().infer_padded(*args, **kwargs)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self.pending:
+                self.pending.append(await self.queue.get())
+            deadline = loop.time() + self.config.window_ms / 1000.
+            while not self._full():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    self.pending.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            batch = self._select()
+            self.metrics.record_batch(len(batch))
+            infer = functools.partial(
+                self._infer,
+                [item.inputs for item in batch],
+                [item.speaker_id for item in batch],
+                **dict(zip(INFER_PARAMS, batch[0].params)),
+            )
+            try:
+                audios = await loop.run_in_executor(self.executor, infer)
+            except Exception as e:
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+                continue
+            for item, audio in zip(batch, audios):
+                if not item.future.done():
+                    item.future.set_result(audio)
+
+
+class TTSServer:
+    """
+    `models` is a `ModelRegistry` (models are loaded on first request and may be
+    evicted) or a plain {language: TTS} dict of always-resident models.
+    """
+
+    def __init__(self, models, config=None):
+        if not isinstance(models, ModelRegistry):
+            models = ModelRegistry(languages=list(models), models=models)
+        self.models = models
+        self.config = config or BatchingConfig()
+        self.metrics = ServerMetrics()
+        # the frontend and the model each get one thread; the event loop only schedules
+        self.frontend_executor = ThreadPoolExecutor(max_workers=1)
+        self.model_executor = ThreadPoolExecutor(max_workers=1)
+        self.batchers = {}
+
+    @property
+    def languages(self):
+        return self.models.languages if self.models.languages is not None else self.models.loaded()
+
+    def _batcher(self, language):
+        if language not in self.batchers:
+            self.batchers[language] = MicroBatcher(
+                functools.partial(self.models.get, language), self.config, self.metrics, self.model_executor
+            )
+        return self.batchers[language]
+
+    def _prepare(self, language, text, speaker):
+        # runs in the frontend executor, so a cold model is loaded off the event loop
+        tts = self.models.get(language)
+        spk2id = tts.hps.data.spk2id
+        if speaker is None:
+            speaker_id = spk2id[list(spk2id.keys())[0]]
+        elif isinstance(speaker, int):
+            # checked here: a bad id inside a shared batch would fail every request in it
+            # (and is a device-side assert on CUDA)
+            n_speakers = tts.hps.data.n_speakers
+            if n_speakers > 0 and not 0 <= speaker < n_speakers:
+                raise ValueError(f"speaker id out of range: {speaker} (model has {n_speakers})")
+            speaker_id = speaker
+        elif speaker in spk2id:
+            speaker_id = spk2id[speaker]
+        else:
+            raise KeyError(f"unknown speaker: {speaker}")
+        texts = tts.split_sentences_into_pieces(text, tts.language, quiet=True)
+        return [tts.get_text_inputs(t) for t in texts], speaker_id, tts.hps.data.sampling_rate
+
+    async def synthesize(self, text, language=None, speaker=None, duration_mode=None, **params):
+        if language is None:
+            language = self.languages[0]
+        if language not in self.models:
+            raise KeyError(f"language not served: {language}")
+        params = {k: float(params.get(k, DEFAULT_PARAMS[k])) for k in INFER_PARAMS}
+        params["sdp_ratio"] = resolve_sdp_ratio(duration_mode, params["sdp_ratio"])
+
+        loop = asyncio.get_running_loop()
+        inputs, speaker_id, sr = await loop.run_in_executor(self.frontend_executor, self._prepare, language, text, speaker)
+        batcher = self._batcher(language)
+        batcher.start()
+        audios = await asyncio.gather(*[batcher.submit(inp, speaker_id, params) for inp in inputs])
+        concat = functools.partial(TTS.audio_numpy_concat, audios, sr=sr, speed=params["speed"])
+        return await loop.run_in_executor(self.frontend_executor, concat), sr
+
+    async def _route(self, method, path, body):
+        if method == "GET" and path == "/health":
+            return 200, "application/json", json.dumps({"languages": self.languages, "loaded": self.models.loaded()}).encode()
+        if method == "GET" and path == "/metrics":
+            return 200, "application/json", json.dumps(dict(self.metrics.snapshot(), models=self.models.stats(), g2p_cache=g2p_cache.stats())).encode()
+        if method == "POST" and path == "/tts":
+            start = time.perf_counter()
+            req = json.loads(body or b"{}")
+            if not isinstance(req, dict):
+                raise ValueError("request body must be a JSON object")
+            text = req.pop("text", "")
+            if not isinstance(text, str):
+                raise ValueError("text must be a string")
+            if not text:
+                return 400, "application/json", b'{"error": "empty text"}'
+            language = req.pop("language", None)
+            speaker = req.pop("speaker", req.pop("speaker_id", None))
+            audio, sr = await self.synthesize(text, language=language, speaker=speaker, **req)
+            bio = io.BytesIO()
+            soundfile.write(bio, audio, sr, format="WAV")
+            self.metrics.record_request(time.perf_counter() - start)
+            return 200, "audio/wav", bio.getvalue()
+        return 404, "application/json", b'{"error": "not found"}'
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            method, path, _ = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, value = line.decode("latin-1").split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            try:
+                status, content_type, payload = await self._route(method, path.split("?")[0], body)
+            except (KeyError, ValueError) as e:
+                self.metrics.num_errors += 1
+                status, content_type, payload = 400, "application/json", json.dumps({"error": str(e)}).encode()
+            except Exception as e:
+                self.metrics.num_errors += 1
+                logger.exception("request failed")
+                status, content_type, payload = 500, "application/json", json.dumps({"error": str(e)}).encode()
+            reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}[status]
+            writer.write(
+                f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+            )
+            writer.write(payload)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="0.0.0.0", port=8000):
+        server = await asyncio.start_server(self.handle, host, port)
+        logger.info(f"DMTTS server listening on {host}:{port} ({', '.join(self.languages)})")
+        async with server:
+            await server.serve_forever()
+
+
+@click.command()
+@click.option('--language', '-l', multiple=True, default=['KR'], help='Language(s) to serve, repeatable')
+@click.option('--device', '-d', default='auto')
+@click.option('--host', '-h', default='0.0.0.0')
+@click.option('--port', '-p', type=int, default=8000)
+@click.option('--batch-window-ms', type=float, default=10.0, show_default=True, help='Micro-batching window')
+@click.option('--max-batch-size', type=int, default=8, show_default=True, help='Max sentences per infer call')
+@click.option('--max-padded-len', type=int, default=4096, show_default=True, help='Max rows x padded phones per infer call')
+@click.option('--max-models', type=int, default=None, help='Max models kept in memory (LRU eviction)')
+@click.option('--max-bytes', type=int, default=None, help='Max total model parameter bytes kept in memory')
+@click.option('--pin', multiple=True, help='Language(s) loaded at startup and never evicted, repeatable')
+@click.option('--quantize', default=None, type=click.Choice(['int8']), help='Dynamic int8 quantization (CPU only)')
+@click.option('--precision', default='fp32', type=click.Choice(['fp32', 'bf16', 'fp16', 'auto']), help='Weights / compute precision')
+@click.option('--g2p-cache-size', type=int, default=None, help='Entries of the shared g2p cache (0 disables it)')
+@click.option('--g2p-cache-file', default=None, help='g2p cache preloaded from this JSON file at startup and saved back on shutdown')
+def main(language, device, host, port, batch_window_ms, max_batch_size, max_padded_len, max_models, max_bytes, pin, quantize, precision, g2p_cache_size, g2p_cache_file):
+    logging.basicConfig(level=logging.INFO)
+    configure_g2p_cache(maxsize=g2p_cache_size, path=g2p_cache_file)
+    models = ModelRegistry(
+        languages=[lang.upper() for lang in language],
+        max_models=max_models,
+        max_bytes=max_bytes,
+        pinned=[lang.upper() for lang in pin],
+        device=device,
+        quantize=quantize,
+        precision=precision,
+    )
+    models.preload()
+    config = BatchingConfig(batch_window_ms, max_batch_size, max_padded_len)
+    try:
+        asyncio.run(TTSServer(models, config).serve(host, port))
+    finally:
+        if g2p_cache_file:
+            logger.info(f"saved {g2p_cache.save(g2p_cache_file)} g2p cache entries to {g2p_cache_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# Inference micro-benchmarks on synthetic phone sequences (no text frontend).
+#
+#   python -m dmtts.infer.benchmark duration -c config.json -m G_700000.pth
+#   python -m dmtts.infer.benchmark duration -c config.json --phones 20,80,200 --device cuda
+#   python -m dmtts.infer.benchmark quantize -c config.json -m G_700000.pth
+#
+# Without --ckpt the model is randomly initialized: stage timings are still
+# meaningful, but durations (and so frame counts) are arbitrary.
+import time
+
+import click
+import librosa
+import torch
+
+from dmtts.app.api import DURATION_MODES, resolve_sdp_ratio
+from dmtts.model.quantization import quantize_dynamic_int8
+from dmtts.model.synthesizer import SynthesizerTrn
+from dmtts.train.mel_processing import mel_spectrogram_torch
+from dmtts.utils import hparam_utils as utils
+from dmtts.utils.download_utils import load_checkpoint_file
+from dmtts.utils.profile_utils import InferenceProfile
+
+
+def load_model(config, ckpt, device):
+    hps = utils.get_hparams_from_file(config)
+    model = SynthesizerTrn(
+        len(hps.symbols),
+        hps.data.filter_length // 2 + 1,
+        hps.train.segment_size // hps.data.hop_length,
+        n_speakers=hps.data.n_speakers,
+        num_tones=hps.num_tones,
+        num_languages=hps.num_languages,
+        lang_list=hps.data.lang_list,
+        **hps.model,
+    )
+    if ckpt is not None:
+        # training (.pth) and inference-only (.safetensors) checkpoints; enc_q may be absent
+        model.load_state_dict(load_checkpoint_file(ckpt, "cpu")["model"], strict=False)
+    return model.to(device).eval(), hps
+
+
+def synthetic_inputs(n_phones, n_symbols, device, generator):
+    x = torch.randint(1, n_symbols, (1, n_phones), generator=generator).to(device)
+    zeros = torch.zeros_like(x)
+    return x, torch.LongTensor([n_phones]).to(device), zeros, zeros
+
+
+def timed_infer(model, inputs, sid, repeat, synchronize, **kwargs):
+    """Mean wall time and per-stage times (s) of `model.infer`, plus output frames."""
+    x, x_lengths, tone, language = inputs
+    with torch.no_grad():
+        model.infer(x, x_lengths, sid, tone, language, **kwargs)  # warm up
+        profile = InferenceProfile(1, synchronize=synchronize)
+        start = time.perf_counter()
+        with profile.activate():
+            for _ in range(repeat):
+                _, _, y_mask, _ = model.infer(x, x_lengths, sid, tone, language, **kwargs)
+        elapsed = time.perf_counter() - start
+    stages = {k: v / repeat for k, v in profile.stages.items()}
+    return elapsed / repeat, stages, int(y_mask.sum())
+
+
+def log_mel(audio, hps):
+    d = hps.data
+    mel = mel_spectrogram_torch(
+        audio.view(1, -1).float().cpu(), d.filter_length, d.n_mel_channels, d.sampling_rate,
+        d.hop_length, d.win_length, d.mel_fmin, d.mel_fmax,
+    )
+    return mel[0].numpy()
+
+
+def mel_distance(audio, reference, hps):
+    """Mean L1 distance per mel bin between log-mels, DTW-aligned (durations may
+    move by a frame once the duration predictors are quantized)."""
+    x, y = log_mel(audio, hps), log_mel(reference, hps)
+    cost, path = librosa.sequence.dtw(x, y, metric="cityblock")
+    return float(cost[-1, -1]) / len(path) / x.shape[0]
+
+
+@click.group()
+def main():
+    pass
+
+
+@main.command()
+@click.option("--config", "-c", required=True, help="Model config.json")
+@click.option("--ckpt", "-m", default=None, help="Checkpoint (random weights if omitted)")
+@click.option("--phones", default="20,80,200", show_default=True, help="Comma-separated input lengths")
+@click.option("--sdp-ratio", default=0.2, show_default=True, help="sdp_ratio used by the blend mode")
+@click.option("--repeat", default=10, show_default=True)
+@click.option("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+def duration(config, ckpt, phones, sdp_ratio, repeat, device):
+    """Latency of each duration mode (see dmtts.app.api.DURATION_MODES)."""
+    model, hps = load_model(config, ckpt, device)
+    generator = torch.Generator().manual_seed(1234)
+    sid = torch.LongTensor([0]).to(device)
+    synchronize = device.startswith("cuda")
+    print(f"device={device} repeat={repeat} blend sdp_ratio={sdp_ratio}")
+    print(f"{'phones':>6s} {'mode':>13s} {'duration ms':>12s} {'total ms':>10s} {'frames':>7s}")
+    for n_phones in [int(n) for n in phones.split(",")]:
+        inputs = synthetic_inputs(n_phones, len(hps.symbols), device, generator)
+        for mode in DURATION_MODES:
+            torch.manual_seed(0)
+            total, stages, frames = timed_infer(
+                model, inputs, sid, repeat, synchronize, sdp_ratio=resolve_sdp_ratio(mode, sdp_ratio)
+            )
+            print(f"{n_phones:6d} {mode:>13s} {stages.get('duration', 0.) * 1000:12.2f} {total * 1000:10.2f} {frames:7d}")
+
+
+@main.command()
+@click.option("--config", "-c", required=True, help="Model config.json")
+@click.option("--ckpt", "-m", default=None, help="Checkpoint (random weights if omitted)")
+@click.option("--phones", default="15,30,45,60,90,120", show_default=True, help="Fixed sentence set: one synthetic sentence per length")
+@click.option("--repeat", default=3, show_default=True)
+@click.option("--threads", default=None, type=int, help="torch.set_num_threads")
+def quantize(config, ckpt, phones, repeat, threads):
+    """Speed and mel distance of int8 dynamic quantization against fp32 (CPU)."""
+    if threads:
+        torch.set_num_threads(threads)
+    variants = {
+        "fp32": lambda m: m.optimize_for_inference(),
+        "int8": lambda m: quantize_dynamic_int8(m.optimize_for_inference()),
+    }
+    generator = torch.Generator().manual_seed(1234)
+    models = {}
+    for name, prepare in variants.items():
+        torch.manual_seed(0)  # same random weights for every variant without --ckpt
+        model, hps = load_model(config, ckpt, "cpu")
+        models[name] = prepare(model)
+    sentences = [synthetic_inputs(int(n), len(hps.symbols), "cpu", generator) for n in phones.split(",")]
+    sid = torch.LongTensor([0])
+    # deterministic: duration predictor only, no prior noise
+    kwargs = dict(sdp_ratio=0, noise_scale=0)
+
+    references, rtfs = [], {}
+    print(f"threads={torch.get_num_threads()} sentences={len(sentences)} repeat={repeat}")
+    print(f"{'variant':>13s} {'rtf':>7s} {'speedup':>8s} {'enc+dur+flow ms':>16s} {'dec ms':>8s} {'frames':>7s} {'mel dist':>9s}")
+    for name, model in models.items():
+        elapsed, total_frames, distances = 0., 0, []
+        stage_totals = {}
+        for i, (x, x_lengths, tone, language) in enumerate(sentences):
+            t, stages, frames = timed_infer(model, (x, x_lengths, tone, language), sid, repeat, False, **kwargs)
+            elapsed += t
+            for k, v in stages.items():
+                stage_totals[k] = stage_totals.get(k, 0.) + v
+            total_frames += frames
+            with torch.no_grad():
+                audio = model.infer(x, x_lengths, sid, tone, language, **kwargs)[0][0, 0]
+            if name == "fp32":
+                references.append(audio)
+            distances.append(mel_distance(audio, references[i], hps))
+        # real-time factor, so a changed total duration does not pass for a speedup
+        rtfs[name] = elapsed / (total_frames * hps.data.hop_length / hps.data.sampling_rate)
+        text_side = sum(stage_totals.get(k, 0.) for k in ("enc_p", "duration", "flow"))
+        print(
+            f"{name:>13s} {rtfs[name]:7.3f} {rtfs['fp32'] / rtfs[name]:7.2f}x {text_side * 1000:16.1f}"
+            f" {stage_totals.get('dec', 0.) * 1000:8.1f} {total_frames:7d} {sum(distances) / len(distances):9.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# Exports SynthesizerTrn as three graphs with static control flow (see
+# dmtts.infer.runtime.GRAPHS); the data-dependent length regulation between
+# the text and acoustic graphs runs in numpy at inference time.
+#
+#   python -m dmtts.infer.export -c config.json -m G_700000.pth -o export/KR
+#   python -m dmtts.infer.export -c config.json -m G_700000.pth -o export/KR --backend torchscript
+#
+# then:  StagedRuntime("export/KR", num_threads=4).infer(phones, tones, speaker_id=0)
+import os
+import json
+import inspect
+
+import click
+import numpy as np
+import torch
+from torch import nn
+
+from dmtts.infer.benchmark import load_model
+from dmtts.infer.runtime import BACKENDS, StagedRuntime, length_regulate
+
+
+class SpeakerGraph(nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.emb_g = model.emb_g
+
+    def forward(self, sid):
+        return self.emb_g(sid).unsqueeze(-1)  # [b, h, 1]
+
+
+class ReferenceSpeakerGraph(nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.ref_enc = model.ref_enc
+
+    def forward(self, spec):
+        return self.ref_enc(spec.transpose(1, 2)).unsqueeze(-1)
+
+
+class TextGraph(nn.Module):
+    """enc_p and both duration predictors; the SDP noise is an input."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.enc_p, self.sdp, self.dp = model.enc_p, model.sdp, model.dp
+        self.use_vc = model.use_vc
+
+    def forward(self, x, x_lengths, tone, g, noise_w, sdp_ratio, noise_scale_w):
+        x, m_p, logs_p, x_mask = self.enc_p(x, x_lengths, tone, g=None if self.use_vc else g)
+        logw_sdp = self.sdp(x, x_mask, g=g, reverse=True, noise_scale=noise_scale_w, noise=noise_w)
+        logw = logw_sdp * sdp_ratio + self.dp(x, x_mask, g=g) * (1 - sdp_ratio)
+        return m_p, logs_p, logw, x_mask
+
+
+class AcousticGraph(nn.Module):
+    """Reverse flow and decoder."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.flow, self.dec = model.flow, model.dec
+
+    def forward(self, z_p, y_mask, g):
+        z = self.flow(z_p, y_mask, g=g, reverse=True)
+        return self.dec(z * y_mask, g=g, x_mask=y_mask)
+
+
+def example_inputs(model, n_phones=24, hop_frames=3):
+    generator = torch.Generator().manual_seed(0)
+    x = torch.randint(1, model.n_vocab, (1, n_phones), generator=generator)
+    if model.n_speakers > 0:
+        speaker = {"sid": torch.LongTensor([0])}
+    else:
+        speaker = {"spec": torch.randn(1, model.spec_channels, 4 * n_phones, generator=generator)}
+    g = torch.randn(1, model.gin_channels, 1, generator=generator)
+    text = {
+        "x": x,
+        "x_lengths": torch.LongTensor([n_phones]),
+        "tone": torch.zeros_like(x),
+        "g": g,
+        "noise_w": torch.randn(1, 2, n_phones, generator=generator),
+        "sdp_ratio": torch.tensor(0.2),
+        "noise_scale_w": torch.tensor(0.8),
+    }
+    t_y = n_phones * hop_frames
+    acoustic = {
+        "z_p": torch.randn(1, model.inter_channels, t_y, generator=generator),
+        "y_mask": torch.ones(1, 1, t_y),
+        "g": g,
+    }
+    return speaker, text, acoustic
+
+
+DYNAMIC_AXES = {
+    "speaker": {"sid": {0: "b"}, "spec": {0: "b", 2: "t_spec"}, "g": {0: "b"}},
+    "text": {
+        "x": {0: "b", 1: "t_x"}, "x_lengths": {0: "b"}, "tone": {0: "b", 1: "t_x"}, "g": {0: "b"},
+        "noise_w": {0: "b", 2: "t_x"}, "m_p": {0: "b", 2: "t_x"}, "logs_p": {0: "b", 2: "t_x"},
+        "logw": {0: "b", 2: "t_x"}, "x_mask": {0: "b", 2: "t_x"},
+    },
+    "acoustic": {"z_p": {0: "b", 2: "t_y"}, "y_mask": {0: "b", 2: "t_y"}, "g": {0: "b"}, "audio": {0: "b", 2: "t_wav"}},
+}
+OUTPUT_NAMES = {"speaker": ["g"], "text": ["m_p", "logs_p", "logw", "x_mask"], "acoustic": ["audio"]}
+
+
+def export_graph(graph, name, inputs, path, backend, opset):
+    args = tuple(inputs.values())
+    if backend == "torchscript":
+        traced = torch.jit.trace(graph, args, check_trace=False)
+        traced.save(path)
+        return
+    axes = {k: v for k, v in DYNAMIC_AXES[name].items() if k in inputs or k in OUTPUT_NAMES[name]}
+    kwargs = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    torch.onnx.export(
+        graph, args, path, input_names=list(inputs), output_names=OUTPUT_NAMES[name],
+        dynamic_axes=axes, opset_version=opset, **kwargs,
+    )
+
+
+@torch.no_grad()
+def export(model, hps, output_dir, backend="onnx", opset=17):
+    """Writes the three graphs and meta.json to `output_dir`."""
+    model = model.cpu().float().eval().optimize_for_inference()
+    os.makedirs(output_dir, exist_ok=True)
+    speaker_graph = SpeakerGraph(model) if model.n_speakers > 0 else ReferenceSpeakerGraph(model)
+    graphs = {"speaker": speaker_graph, "text": TextGraph(model), "acoustic": AcousticGraph(model)}
+    for (name, graph), inputs in zip(graphs.items(), example_inputs(model)):
+        export_graph(graph.eval(), name, inputs, os.path.join(output_dir, name + BACKENDS[backend]), backend, opset)
+    meta = {
+        "backend": backend,
+        "sampling_rate": hps.data.sampling_rate,
+        "hop_length": hps.data.hop_length,
+        "n_speakers": model.n_speakers,
+        "spk2id": dict(getattr(hps.data, "spk2id", {}) or {}),
+    }
+    with open(os.path.join(output_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+    return meta
+
+
+@torch.no_grad()
+def check(model, runtime, lengths=(1, 3, 7, 24, 61)):
+    """
+    Runs the exported stages and the PyTorch model on the same inputs and noise
+    (including the numpy length regulation) and returns the max abs difference
+    of the audio per input length.
+    """
+    generator = torch.Generator().manual_seed(1)
+    diffs = {}
+    for n in lengths:
+        x = torch.randint(1, model.n_vocab, (1, n), generator=generator)
+        x_lengths, tone, sid = torch.LongTensor([n]), torch.zeros_like(x), torch.LongTensor([0])
+        noise_w = torch.randn(1, 2, n, generator=generator)
+
+        g = model.emb_g(sid).unsqueeze(-1) if model.n_speakers > 0 else None
+        g_rt = runtime.speaker([0]) if model.n_speakers > 0 else None
+        if g is None:
+            spec = torch.randn(1, model.spec_channels, 4 * n, generator=generator)
+            g, g_rt = model.ref_enc(spec.transpose(1, 2)).unsqueeze(-1), runtime.speaker(spec=spec.numpy())
+        h, m_p, logs_p, x_mask = model.enc_p(x, x_lengths, tone, g=None if model.use_vc else g)
+        logw = model.sdp(h, x_mask, g=g, reverse=True, noise_scale=0.8, noise=noise_w) * 0.2 + model.dp(h, x_mask, g=g) * 0.8
+        m_p, logs_p, y_mask = length_regulate(m_p.numpy(), logs_p.numpy(), logw.numpy(), x_mask.numpy())
+        eps = np.random.default_rng(n).standard_normal(m_p.shape, dtype=np.float32)
+        z_p = torch.from_numpy(m_p + eps * np.exp(logs_p) * 0.6)
+        y_mask_t = torch.from_numpy(y_mask)
+        ref = model.dec(model.flow(z_p, y_mask_t, g=g, reverse=True) * y_mask_t, g=g, x_mask=y_mask_t).numpy()
+
+        rt = runtime.text(x.numpy(), x_lengths.numpy(), tone.numpy(), g_rt, noise_w.numpy(), 0.2, 0.8)
+        m_p_rt, logs_p_rt, y_mask_rt = length_regulate(rt[0], rt[1], rt[2], rt[3])
+        if m_p_rt.shape != m_p.shape:
+            diffs[n] = float("inf")
+            continue
+        out = runtime.acoustic(m_p_rt + eps * np.exp(logs_p_rt) * 0.6, y_mask_rt, g_rt)
+        diffs[n] = float(np.abs(out - ref).max())
+    return diffs
+
+
+@click.command()
+@click.option("--config", "-c", required=True, help="Model config.json")
+@click.option("--ckpt", "-m", required=True, help="Checkpoint (.pth or inference-only .safetensors)")
+@click.option("--output-dir", "-o", required=True)
+@click.option("--backend", default="onnx", type=click.Choice(list(BACKENDS)), show_default=True)
+@click.option("--opset", default=17, show_default=True, help="ONNX opset")
+@click.option("--check/--no-check", "run_check", default=True, show_default=True, help="Compare the exported graphs against PyTorch")
+def main(config, ckpt, output_dir, backend, opset, run_check):
+    model, hps = load_model(config, ckpt, "cpu")
+    export(model, hps, output_dir, backend=backend, opset=opset)
+    print(f"exported {', '.join(n + BACKENDS[backend] for n in ('speaker', 'text', 'acoustic'))} to {output_dir}")
+    if run_check:
+        diffs = check(model, StagedRuntime(output_dir))
+        print("max abs audio diff per phone count: " + ", ".join(f"{n}: {d:.2e}" for n, d in diffs.items()))
+        if any(not d <= 1e-3 for d in diffs.values()):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
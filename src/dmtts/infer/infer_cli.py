@@ -35,6 +35,9 @@ def parse_args():
 
     p.add_argument("--speed", type=float, default=1.0, help="Speech speed (0.1 ~ 10.0)")
     p.add_argument("--device", default="auto", choices=["auto", "cpu", "cuda"], help="Device selection")
+    p.add_argument("--sdp_ratio", type=float, default=0.2, help="Weight of the stochastic duration predictor")
+    p.add_argument("--duration_mode", choices=["blend", "deterministic", "stochastic"], default="blend",
+                   help="deterministic / stochastic run a single duration predictor (faster), blend mixes both by --sdp_ratio")
 
     p.add_argument("--output_dir", type=str, default="outputs")
     p.add_argument("--list_speakers", type=bool, default=True)
@@ -87,7 +90,7 @@ def main():
         save_path = os.path.join(out_root, rel)
         _ensure_dir(os.path.dirname(save_path))
         # print(f"INFER_CLI (text): {text}")
-        model.tts_to_file(text, spk_id, save_path, speed=args.speed) ## inference
+        model.tts_to_file(text, spk_id, save_path, speed=args.speed, sdp_ratio=args.sdp_ratio, duration_mode=args.duration_mode) ## inference
         print(f"[OK] {spk_name:>12s} -> {save_path}")
 
     print("Done.")
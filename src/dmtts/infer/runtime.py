@@ -0,0 +1,114 @@
+import os
+import json
+
+import numpy as np
+
+# graphs written by dmtts.infer.export, in execution order
+#   speaker    sid [b] (or spec [b, spec_channels, t] for reference-encoder models) -> g [b, gin, 1]
+#   text       x, x_lengths, tone, g, noise_w, sdp_ratio, noise_scale_w -> m_p, logs_p, logw, x_mask
+#   acoustic   z_p, y_mask, g -> audio [b, 1, t * hop]
+# with `length_regulate` (numpy) between text and acoustic.
+GRAPHS = ("speaker", "text", "acoustic")
+BACKENDS = {"onnx": ".onnx", "torchscript": ".pt"}
+
+
+def length_regulate(m_p, logs_p, logw, x_mask, length_scale=1.0):
+    """
+    numpy version of the duration / generate_path step of `SynthesizerTrn.infer`:
+    durations are exp(logw) rounded up, and every phone's prior is repeated for
+    its number of frames. Returns m_p, logs_p expanded to [b, d, t_y] and y_mask.
+    """
+    w_ceil = np.ceil(np.exp(logw.astype(np.float32)) * x_mask * length_scale).astype(np.int64)[:, 0]
+    y_lengths = np.maximum(w_ceil.sum(1), 1)
+    b, d, t_x = m_p.shape
+    t_y = int(y_lengths.max())
+    m_p_y = np.zeros((b, d, t_y), dtype=m_p.dtype)
+    logs_p_y = np.zeros((b, d, t_y), dtype=logs_p.dtype)
+    for i in range(b):
+        idx = np.repeat(np.arange(t_x), w_ceil[i])
+        m_p_y[i, :, : len(idx)] = m_p[i][:, idx]
+        logs_p_y[i, :, : len(idx)] = logs_p[i][:, idx]
+    y_mask = (np.arange(t_y)[None, :] < y_lengths[:, None])[:, None].astype(np.float32)
+    return m_p_y, logs_p_y, y_mask
+
+
+class StagedRuntime:
+    """
+    Runs an exported model (see dmtts.infer.export) without the training
+    dependencies: onnxruntime (or TorchScript) for the graphs, numpy in between.
+
+        runtime = StagedRuntime("export/KR", num_threads=4)
+        audio = runtime.infer(phones, tones, speaker_id=0)
+
+    phones / tones are the int sequences `TTS.get_text_inputs` produces.
+    `num_threads` sizes the engine's intra-op thread pool (None: engine default).
+    """
+
+    def __init__(self, export_dir, num_threads=None, backend=None):
+        with open(os.path.join(export_dir, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.backend = backend or self.meta["backend"]
+        if self.backend not in BACKENDS:
+            raise ValueError(f"unknown backend: {self.backend} (expected one of {tuple(BACKENDS)})")
+        self.sampling_rate = self.meta["sampling_rate"]
+        self.num_threads = num_threads
+        paths = {name: os.path.join(export_dir, name + BACKENDS[self.backend]) for name in GRAPHS}
+        loader = self._onnx_session if self.backend == "onnx" else self._torchscript_module
+        self.graphs = {name: loader(path) for name, path in paths.items()}
+
+    def _onnx_session(self, path):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        if self.num_threads:
+            options.intra_op_num_threads = self.num_threads
+            options.inter_op_num_threads = 1
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        names = [o.name for o in session.get_outputs()]
+        return lambda **inputs: session.run(names, inputs)
+
+    def _torchscript_module(self, path):
+        import torch
+
+        if self.num_threads:
+            torch.set_num_threads(self.num_threads)
+        module = torch.jit.load(path, map_location="cpu").eval()
+
+        def run(**inputs):
+            with torch.no_grad():
+                outputs = module(**{k: torch.from_numpy(v) for k, v in inputs.items()})
+            outputs = outputs if isinstance(outputs, (tuple, list)) else (outputs,)
+            return [o.numpy() for o in outputs]
+        return run
+
+    def speaker(self, speaker_ids=None, spec=None):
+        if spec is not None:
+            return self.graphs["speaker"](spec=spec.astype(np.float32))[0]
+        return self.graphs["speaker"](sid=np.asarray(speaker_ids, dtype=np.int64))[0]
+
+    def text(self, x, x_lengths, tone, g, noise_w, sdp_ratio=0.2, noise_scale_w=0.8):
+        return self.graphs["text"](
+            x=x, x_lengths=x_lengths, tone=tone, g=g, noise_w=noise_w.astype(np.float32),
+            sdp_ratio=np.array(sdp_ratio, dtype=np.float32),
+            noise_scale_w=np.array(noise_scale_w, dtype=np.float32),
+        )
+
+    def acoustic(self, z_p, y_mask, g):
+        return self.graphs["acoustic"](z_p=z_p.astype(np.float32), y_mask=y_mask, g=g)[0]
+
+    def infer(self, phones, tones, speaker_id=0, sdp_ratio=0.2, noise_scale=0.6, noise_scale_w=0.8, length_scale=1.0, spec=None, seed=None):
+        """float32 waveform of one sentence."""
+        rng = np.random.default_rng(seed)
+        x = np.asarray(phones, dtype=np.int64)[None]
+        tone = np.asarray(tones, dtype=np.int64)[None]
+        t_x = x.shape[1]
+        x_lengths = np.array([t_x], dtype=np.int64)
+
+        g = self.speaker([speaker_id]) if spec is None else self.speaker(spec=spec)
+        noise_w = rng.standard_normal((1, 2, t_x), dtype=np.float32)
+        m_p, logs_p, logw, x_mask = self.text(x, x_lengths, tone, g, noise_w, sdp_ratio, noise_scale_w)
+        m_p, logs_p, y_mask = length_regulate(m_p, logs_p, logw, x_mask, length_scale)
+        z_p = m_p + rng.standard_normal(m_p.shape, dtype=np.float32) * np.exp(logs_p) * noise_scale
+        audio = self.acoustic(z_p, y_mask, g)
+        return audio[0, 0, : int(y_mask.sum()) * self.meta["hop_length"]]
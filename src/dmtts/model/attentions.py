@@ -1,4 +1,5 @@
 import math
+import functools
 import torch
 from torch import nn
 from torch.nn import functional as F
@@ -20,7 +21,7 @@ class LayerNorm(nn.Module):
 
     def forward(self, x):
         x = x.transpose(1, -1)
-        x = F.layer_norm(x, (self.channels,), self.gamma, self.beta, self.eps)
+        x = F.layer_norm(x, (self.channels,), self.gamma.to(x.dtype), self.beta.to(x.dtype), self.eps)
         return x.transpose(1, -1)
 
 
@@ -34,6 +35,31 @@ def fused_add_tanh_sigmoid_multiply(input_a, input_b, n_channels):
     return acts
 
 
+# lengths are rounded up to a multiple of this for the relative-position cache
+RELATIVE_BAND_BUCKET = 64
+
+
+@functools.lru_cache(maxsize=16)
+def _relative_positions(bucket, window_size, device):
+    # key position of every (query, relative offset) pair: [bucket, 2 * window_size + 1]
+    return torch.arange(bucket, device=device).unsqueeze(1) + torch.arange(
+        -window_size, window_size + 1, device=device
+    )
+
+
+def relative_band(length, window_size, device):
+    """
+    Index and validity mask ([length, 2 * window_size + 1]) of the keys each
+    query sees through the relative-position window, for
+    `MultiHeadAttention.attention_inference`. Depends only on the length, so
+    one band serves every layer with the same `window_size`.
+    """
+    bucket = -(-length // RELATIVE_BAND_BUCKET) * RELATIVE_BAND_BUCKET
+    positions = _relative_positions(bucket, window_size, device)[:length]
+    valid = (positions >= 0) & (positions < length)
+    return positions.clamp(0, length - 1), valid
+
+
 class Encoder(nn.Module): # FFT..?
     def __init__(
         self,
@@ -95,16 +121,26 @@ class Encoder(nn.Module): # FFT..?
             )
             self.norm_layers_2.append(LayerNorm(hidden_channels))
 
+    def project_g(self, g):
+        if not hasattr(self, "spk_emb_linear"):
+            return None
+        g = self.spk_emb_linear(g.transpose(1, 2)) # speaker embedding
+        return g.transpose(1, 2)
+
     def forward(self, x, x_mask, g=None):
         attn_mask = x_mask.unsqueeze(2) * x_mask.unsqueeze(-1)
+        band = None
+        if not self.training and self.window_size is not None and not torch.jit.is_tracing():
+            # inference: the relative-position band and the mask are built once for all layers
+            band = relative_band(x.size(2), self.window_size, x.device)
+            attn_mask = attn_mask.bool()
         x = x * x_mask
         for i in range(self.n_layers):
             if i == self.cond_layer_idx and g is not None:
-                g = self.spk_emb_linear(g.transpose(1, 2)) # speaker embedding
-                g = g.transpose(1, 2)
+                g = commons.speaker_projection(self, g)
                 x = x + g
                 x = x * x_mask
-            y = self.attn_layers[i](x, x, attn_mask)
+            y = self.attn_layers[i](x, x, attn_mask, band=band)
             y = self.drop(y)
             x = self.norm_layers_1[i](x + y)
 
@@ -233,6 +269,7 @@ class MultiHeadAttention(nn.Module):
         self.conv_k = nn.Conv1d(channels, channels, 1)
         self.conv_v = nn.Conv1d(channels, channels, 1)
         self.conv_o = nn.Conv1d(channels, out_channels, 1)
+        self.conv_qkv = None  # set by fuse_qkv()
         self.drop = nn.Dropout(p_dropout)
 
         if window_size is not None:
@@ -255,16 +292,91 @@ class MultiHeadAttention(nn.Module):
                 self.conv_k.weight.copy_(self.conv_q.weight)
                 self.conv_k.bias.copy_(self.conv_q.bias)
 
-    def forward(self, x, c, attn_mask=None):
-        q = self.conv_q(x)
-        k = self.conv_k(c)
-        v = self.conv_v(c)
-
-        x, self.attn = self.attention(q, k, v, mask=attn_mask)
+    @torch.no_grad()
+    def fuse_qkv(self):
+        """Inference only: merges conv_q / conv_k / conv_v into one conv_qkv."""
+        if self.conv_qkv is not None:
+            return
+        convs = (self.conv_q, self.conv_k, self.conv_v)
+        conv_qkv = nn.Conv1d(self.channels, 3 * self.channels, 1)
+        conv_qkv.to(self.conv_q.weight)
+        conv_qkv.weight.copy_(torch.cat([conv.weight for conv in convs], 0))
+        conv_qkv.bias.copy_(torch.cat([conv.bias for conv in convs], 0))
+        self.conv_qkv = conv_qkv
+        del self.conv_q, self.conv_k, self.conv_v
+
+    def forward(self, x, c, attn_mask=None, band=None):
+        if self.conv_qkv is None:
+            q = self.conv_q(x)
+            k = self.conv_k(c)
+            v = self.conv_v(c)
+        elif c is x:
+            q, k, v = self.conv_qkv(x).chunk(3, dim=1)
+        else:  # cross-attention: q from x, k / v from c, each through its rows of conv_qkv
+            weight, bias = self.conv_qkv.weight, self.conv_qkv.bias
+            q = F.conv1d(x, weight[: self.channels], bias[: self.channels])
+            k, v = F.conv1d(c, weight[self.channels :], bias[self.channels :]).chunk(2, dim=1)
+
+        if self.training or self.block_length is not None or torch.jit.is_tracing():
+            # traced graphs keep `attention`, which has no length-dependent cache
+            x, self.attn = self.attention(q, k, v, mask=attn_mask)
+        else:
+            x, self.attn = self.attention_inference(q, k, v, mask=attn_mask, band=band)
 
         x = self.conv_o(x)
         return x
 
+    def attention_inference(self, query, key, value, mask=None, band=None):
+        """
+        Eval-mode equivalent of `attention`. Relative attention only touches
+        the 2 * window_size + 1 keys around each query, so the relative logits
+        are scattered into and the relative weights gathered from that band
+        (see `relative_band`) instead of padding the embeddings to 2 * t - 1
+        positions. Without a window the whole computation is one
+        F.scaled_dot_product_attention call and no weights are returned.
+        """
+        b, d, t_s, t_t = (*key.size(), query.size(2))
+        query = query.view(b, self.n_heads, self.k_channels, t_t).transpose(2, 3)
+        key = key.view(b, self.n_heads, self.k_channels, t_s).transpose(2, 3)
+        value = value.view(b, self.n_heads, self.k_channels, t_s).transpose(2, 3)
+
+        if self.window_size is None:
+            bias = None
+            if self.proximal_bias:
+                assert t_s == t_t, "Proximal bias is only available for self-attention."
+                bias = self._attention_bias_proximal(t_s).to(device=query.device, dtype=query.dtype)
+            if mask is not None:
+                # additive instead of masked_fill: identical for rows with any unmasked key
+                mask_bias = torch.zeros(mask.shape, device=query.device, dtype=query.dtype)
+                mask_bias = mask_bias.masked_fill(mask == 0, -1e4)
+                bias = mask_bias if bias is None else bias + mask_bias
+            output = F.scaled_dot_product_attention(query, key, value, attn_mask=bias)
+            return output.transpose(2, 3).contiguous().view(b, d, t_t), None
+
+        assert t_s == t_t, "Relative attention is only available for self-attention."
+        if band is None:
+            band = relative_band(t_s, self.window_size, query.device)
+        index, valid = band
+        index = index.expand(b, self.n_heads, -1, -1)  # [b, n_h, t, 2w+1]
+        valid = valid.to(query.dtype)
+
+        query = query / math.sqrt(self.k_channels)
+        scores = torch.matmul(query, key.transpose(-2, -1))
+        rel_logits = self._matmul_with_relative_keys(query, self.emb_rel_k)  # [b, n_h, t, 2w+1]
+        scores = scores.scatter_add(-1, index, rel_logits * valid)
+        if self.proximal_bias:
+            scores = scores + self._attention_bias_proximal(t_s).to(
+                device=scores.device, dtype=scores.dtype
+            )
+        if mask is not None:
+            scores = scores.masked_fill(mask == 0, -1e4)
+        p_attn = F.softmax(scores, dim=-1)  # [b, n_h, t_t, t_s]
+        output = torch.matmul(p_attn, value)
+        relative_weights = torch.gather(p_attn, -1, index) * valid
+        output = output + self._matmul_with_relative_values(relative_weights, self.emb_rel_v)
+        output = output.transpose(2, 3).contiguous().view(b, d, t_t)
+        return output, p_attn
+
     def attention(self, query, key, value, mask=None):
         # reshape [b, d, t] -> [b, n_h, t, d_k]
         b, d, t_s, t_t = (*key.size(), query.size(2))
@@ -335,20 +447,15 @@ class MultiHeadAttention(nn.Module):
         return ret
 
     def _get_relative_embeddings(self, relative_embeddings, length):
-        2 * self.window_size + 1
-        # Pad first before slice to avoid using cond ops.
-        pad_length = max(length - (self.window_size + 1), 0)
-        slice_start_position = max((self.window_size + 1) - length, 0)
-        slice_end_position = slice_start_position + 2 * length - 1
-        if pad_length > 0:
-            padded_relative_embeddings = F.pad(
-                relative_embeddings,
-                commons.convert_pad_shape([[0, 0], [pad_length, pad_length], [0, 0]]),
-            )
-        else:
-            padded_relative_embeddings = relative_embeddings
+        # Pad first before slice to avoid using cond ops. Padding by length - 1
+        # (more than the length - window_size - 1 needed) keeps the slice start
+        # constant, so a traced / exported graph stays valid for every length.
+        padded_relative_embeddings = F.pad(
+            relative_embeddings,
+            commons.convert_pad_shape([[0, 0], [length - 1, length - 1], [0, 0]]),
+        )
         used_relative_embeddings = padded_relative_embeddings[
-            :, slice_start_position:slice_end_position
+            :, self.window_size : self.window_size + 2 * length - 1
         ]
         return used_relative_embeddings
 
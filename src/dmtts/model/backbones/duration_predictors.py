@@ -4,6 +4,7 @@ from torch import nn
 from torch.nn import functional as F
 
 from dmtts.model import modules
+from dmtts.model import commons
 
 # ===== Duration Predictors =====
 class StochasticDurationPredictor(nn.Module):
@@ -55,12 +56,17 @@ class StochasticDurationPredictor(nn.Module):
         if gin_channels != 0:
             self.cond = nn.Conv1d(gin_channels, filter_channels, 1)
 
-    def forward(self, x, x_mask, w=None, g=None, reverse=False, noise_scale=1.0):
+    def project_g(self, g):
+        if not hasattr(self, "cond"):
+            return None
+        return self.cond(torch.detach(g))
+
+    def forward(self, x, x_mask, w=None, g=None, reverse=False, noise_scale=1.0, noise=None):
+        # noise: [b, 2, t] standard normal for reverse, drawn here if None
         x = torch.detach(x)
         x = self.pre(x)
         if g is not None:
-            g = torch.detach(g)
-            x = x + self.cond(g)
+            x = x + commons.speaker_projection(self, g)
         x = self.convs(x, x_mask)
         x = self.proj(x) * x_mask
 
@@ -106,10 +112,9 @@ class StochasticDurationPredictor(nn.Module):
         else:
             flows = list(reversed(self.flows))
             flows = flows[:-2] + [flows[-1]]  # remove a useless vflow
-            z = (
-                torch.randn(x.size(0), 2, x.size(2)).to(device=x.device, dtype=x.dtype)
-                * noise_scale
-            )
+            if noise is None:
+                noise = torch.randn(x.size(0), 2, x.size(2)).to(device=x.device, dtype=x.dtype)
+            z = noise * noise_scale
             for flow in flows:
                 z = flow(z, x_mask, g=x, reverse=reverse)
             z0, z1 = torch.split(z, [1, 1], 1)
@@ -142,11 +147,15 @@ class DurationPredictor(nn.Module):
         if gin_channels != 0:
             self.cond = nn.Conv1d(gin_channels, in_channels, 1)
 
+    def project_g(self, g):
+        if not hasattr(self, "cond"):
+            return None
+        return self.cond(torch.detach(g))
+
     def forward(self, x, x_mask, g=None):
         x = torch.detach(x)
         if g is not None:
-            g = torch.detach(g)
-            x = x + self.cond(g)
+            x = x + commons.speaker_projection(self, g)
         x = self.conv_1(x * x_mask)
         x = torch.relu(x)
         x = self.norm_1(x)
@@ -59,6 +59,7 @@ class TextEncoder(nn.Module):
         self.proj_in = nn.Linear(2*hidden_channels, hidden_channels)
 
         # conv feature extractor 
+        self.convnext_layers = convnext_layers
         if convnext_layers > 0 :
             self.text_blocks = nn.Sequential(
                 *[modules.ConvNeXtV2Block(hidden_channels, hidden_channels*convnext_mult) for _ in range(convnext_layers)]
@@ -132,13 +133,19 @@ class TextEncoder(nn.Module):
         x = x + pos_emb
 
         #print("#### TextEncoder ###### 6 ####### Forward #######")
-        # ConvNeXtV2 stacks
-        x = self.text_blocks(x) # [B, T, H]
+        x_mask = torch.unsqueeze(
+            (torch.arange(T, device=x.device)[None, :] < x_lengths[:, None]), 1
+        ).to(x.dtype) # [B, 1, T]
+
+        # ConvNeXtV2 stacks (masked so that padded batches match unpadded inference)
+        if self.convnext_layers > 0:
+            t_mask = x_mask.transpose(1, 2) # [B, T, 1]
+            for block in self.text_blocks:
+                x = block(x, t_mask) # [B, T, H]
+        else:
+            x = self.text_blocks(x)
         x = x.transpose(1,2) # [B, H, T]
         #print("#### TextEncoder ###### 7 ####### Forward #######")
-        x_mask = torch.unsqueeze(
-            (torch.arange(x.size(2), device=x.device)[None, :] < x_lengths[:, None]), 1
-        ).to(x.dtype)
 
         #print("#### TextEncoder ###### 8 ####### Forward #######")
         x = self.encoder(x * x_mask, x_mask, g=g)
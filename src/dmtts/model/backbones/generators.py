@@ -23,6 +23,11 @@ class Generator(torch.nn.Module):
         super(Generator, self).__init__()
         self.num_kernels = len(resblock_kernel_sizes)
         self.num_upsamples = len(upsample_rates)
+        self.upsample_rates = upsample_rates
+        self.upsample_kernel_sizes = upsample_kernel_sizes
+        self.resblock_kernel_sizes = resblock_kernel_sizes
+        self.resblock_dilation_sizes = resblock_dilation_sizes
+        self.resblock_type = resblock
         self.conv_pre = Conv1d(
             initial_channel, upsample_initial_channel, 7, 1, padding=3
         )
@@ -55,20 +60,34 @@ class Generator(torch.nn.Module):
         if gin_channels != 0:
             self.cond = nn.Conv1d(gin_channels, upsample_initial_channel, 1)
 
-    def forward(self, x, g=None):
+    def project_g(self, g):
+        if not hasattr(self, "cond"):
+            return None
+        return self.cond(g)
+
+    def forward(self, x, g=None, x_mask=None):
+        """
+        x: [b, h, t]
+        x_mask: optional [b, 1, t] frame mask for padded batches; padded frames
+                are zeroed at every stage so each row decodes as if unpadded.
+        """
         x = self.conv_pre(x)
         if g is not None:
-            x = x + self.cond(g)
+            x = x + commons.speaker_projection(self, g)
 
         for i in range(self.num_upsamples):
             x = F.leaky_relu(x, modules.LRELU_SLOPE)
+            if x_mask is not None:
+                x = x * x_mask
             x = self.ups[i](x)
+            if x_mask is not None:
+                x_mask = torch.repeat_interleave(x_mask, self.upsample_rates[i], dim=2)
             xs = None
             for j in range(self.num_kernels):
                 if xs is None:
-                    xs = self.resblocks[i * self.num_kernels + j](x)
+                    xs = self.resblocks[i * self.num_kernels + j](x, x_mask)
                 else:
-                    xs += self.resblocks[i * self.num_kernels + j](x)
+                    xs += self.resblocks[i * self.num_kernels + j](x, x_mask)
             x = xs / self.num_kernels
         x = F.leaky_relu(x)
         x = self.conv_post(x)
@@ -76,6 +95,42 @@ class Generator(torch.nn.Module):
 
         return x
 
+    def receptive_field(self):
+        """One-sided receptive field of the generator, in input (latent) frames."""
+        frames = 3 / 1  # conv_pre, kernel 7
+        hop = 1
+        for u, k in zip(self.upsample_rates, self.upsample_kernel_sizes):
+            frames += math.ceil(k / u) / hop  # transposed conv, at the input rate
+            hop *= u
+            pads = []
+            for rk, rd in zip(self.resblock_kernel_sizes, self.resblock_dilation_sizes):
+                if self.resblock_type == "1":
+                    pads.append(sum(commons.get_padding(rk, d) + commons.get_padding(rk, 1) for d in rd))
+                else:
+                    pads.append(sum(commons.get_padding(rk, d) for d in rd))
+            frames += max(pads) / hop
+        frames += 3 / hop  # conv_post, kernel 7
+        return math.ceil(frames)
+
+    def decode_chunks(self, x, g=None, chunk_size=32, context=None):
+        """
+        Decode x: [1, h, t] in windows of `chunk_size` frames, yielding audio
+        [1, 1, chunk_size * hop] as soon as each window is done. Every window is
+        decoded with `context` frames of left/right context (default: the full
+        receptive field) which are trimmed off, so the concatenated chunks equal
+        a single full-length forward.
+        """
+        if context is None:
+            context = self.receptive_field()
+        hop = math.prod(self.upsample_rates)
+        t = x.size(2)
+        for start in range(0, t, chunk_size):
+            end = min(start + chunk_size, t)
+            left = max(start - context, 0)
+            right = min(end + context, t)
+            o = self(x[:, :, left:right], g=g)
+            yield o[:, :, (start - left) * hop : (end - left) * hop]
+
     def remove_weight_norm(self):
         print("Removing weight norm...")
         for layer in self.ups:
@@ -19,6 +19,78 @@ def convert_pad_shape(pad_shape):
     return pad_shape
 
 
+class SpeakerCondition:
+    """
+    Speaker embedding g [b, h, 1] of an inference call together with the
+    g-only projections of every module it conditions, computed once (see
+    `SynthesizerTrn.speaker_condition`). Passed as `g`, modules take their
+    projection from here instead of recomputing it (`speaker_projection`).
+    Inference only: projections carry no autograd history.
+    """
+
+    def __init__(self, g, projections=None):
+        self.g = g
+        self.projections = {} if projections is None else projections
+
+    @classmethod
+    @torch.no_grad()
+    def precompute(cls, model, g):
+        projections = {}
+        for module in model.modules():
+            if module is not model and hasattr(module, "project_g"):
+                projection = module.project_g(g)
+                if projection is not None:
+                    projections[module] = projection
+        return cls(g, projections)
+
+    @classmethod
+    def cat(cls, conditions):
+        if len(conditions) == 1:
+            return conditions[0]
+        g = torch.cat([c.g for c in conditions], 0)
+        projections = {m: torch.cat([c.projections[m] for c in conditions], 0) for m in conditions[0].projections}
+        return cls(g, projections)
+
+    def __getitem__(self, idx):  # batch rows, e.g. g[i : i + 1]
+        return SpeakerCondition(self.g[idx], {m: p[idx] for m, p in self.projections.items()})
+
+    def size(self, dim=None):
+        return self.g.size() if dim is None else self.g.size(dim)
+
+
+def speaker_projection(module, g):
+    """module.project_g(g), or the precomputed one if g is a `SpeakerCondition`."""
+    if isinstance(g, SpeakerCondition):
+        projection = g.projections.get(module)
+        return projection if projection is not None else module.project_g(g.g)
+    return module.project_g(g)
+
+
+def fold_weight_norm(model):
+    """
+    Folds every weight norm of `model` (old-style hooks and parametrizations)
+    into a plain weight, so it is no longer recomputed from g / v on each forward.
+    """
+    from torch.nn.utils import parametrize
+    from torch.nn.utils.weight_norm import WeightNorm
+
+    for module in model.modules():
+        for hook in list(module._forward_pre_hooks.values()):
+            if isinstance(hook, WeightNorm):
+                torch.nn.utils.remove_weight_norm(module, hook.name)
+        if parametrize.is_parametrized(module):
+            for name in list(module.parametrizations.keys()):
+                parametrize.remove_parametrizations(module, name, leave_parametrized=True)
+
+
+def remove_dropout(model):
+    """Replaces every nn.Dropout of `model` by nn.Identity (inference only)."""
+    for module in list(model.modules()):
+        for name, child in list(module.named_children()):
+            if isinstance(child, torch.nn.Dropout):
+                setattr(module, name, torch.nn.Identity())
+
+
 def intersperse(lst, item):
     result = [item] * (len(lst) * 2 + 1)
     result[1::2] = lst
@@ -45,13 +117,16 @@ def rand_gumbel_like(x):
     return g
 
 
-def slice_segments(x, ids_str, segment_size=4):
-    ret = torch.zeros_like(x[:, :, :segment_size])
-    for i in range(x.size(0)):
-        idx_str = ids_str[i]
-        idx_end = idx_str + segment_size
-        ret[i] = x[i, :, idx_str:idx_end]
-    return ret
+def slice_segments(x, ids_str, segment_size=4, hop_length=1):
+    """
+    x[i, :, ids_str[i] * hop_length : ids_str[i] * hop_length + segment_size] for
+    every row, as a single gather. With hop_length > 1 the frame-domain ids_str
+    of `rand_slice_segments` slice a sample-domain signal (the wav).
+    """
+    b, d, _ = x.size()
+    idx = ids_str.to(device=x.device, dtype=torch.long).view(b, 1, 1) * hop_length
+    idx = idx + torch.arange(segment_size, device=x.device).view(1, 1, segment_size)
+    return torch.gather(x, 2, idx.expand(b, d, segment_size))
 
 
 def rand_slice_segments(x, x_lengths=None, segment_size=4):
@@ -142,19 +217,56 @@ def generate_path(duration, mask):
     return path
 
 
+def expand_by_durations(x, duration, max_length=None):
+    """
+    Length regulator: phone j of row i repeated duration[i, 0, j] times,
+    as a gather of [b, d, t_y] instead of the dense `generate_path` matmul.
+    Frames past a row's total duration are zero, as with the path.
+
+    x: [b, d, t_x]
+    duration: [b, 1, t_x], integer-valued
+    """
+    b, d, t_x = x.shape
+    cum_duration = torch.cumsum(duration[:, 0].long(), -1)  # [b, t_x]
+    if max_length is None:
+        max_length = int(cum_duration[:, -1].max())
+    frames = torch.arange(max_length, device=x.device).expand(b, max_length).contiguous()
+    # frame f belongs to the first phone whose cumulative duration exceeds f
+    idx = torch.searchsorted(cum_duration, frames, right=True)  # [b, t_y]
+    valid = (idx < t_x).unsqueeze(1)
+    idx = idx.clamp(max=t_x - 1).unsqueeze(1).expand(b, d, max_length)
+    return torch.gather(x, 2, idx) * valid.to(x.dtype)
+
+
 def clip_grad_value_(parameters, clip_value, norm_type=2):
+    """
+    Clamps every gradient to [-clip_value, clip_value] (None: no clamping) and
+    returns the total norm of the gradients before clamping.
+
+    Everything stays on the device: the per-tensor norms and the clamping are
+    foreach ops, and the norm is returned as a 0-dim tensor, so the host only
+    waits for it when it is actually read (e.g. logged).
+    """
     if isinstance(parameters, torch.Tensor):
         parameters = [parameters]
-    parameters = list(filter(lambda p: p.grad is not None, parameters))
+    grads = [p.grad.detach() for p in parameters if p.grad is not None]
     norm_type = float(norm_type)
+    if len(grads) == 0:
+        return torch.tensor(0.0)
+
+    device = grads[0].device
+    if hasattr(torch, "_foreach_norm"):
+        norms = torch._foreach_norm(grads, norm_type)
+    else:
+        norms = [torch.linalg.vector_norm(g, norm_type) for g in grads]
+    total_norm = torch.linalg.vector_norm(torch.stack([n.float().to(device) for n in norms]), norm_type)
+
     if clip_value is not None:
         clip_value = float(clip_value)
-
-    total_norm = 0
-    for p in parameters:
-        param_norm = p.grad.data.norm(norm_type)
-        total_norm += param_norm.item() ** norm_type
-        if clip_value is not None:
-            p.grad.data.clamp_(min=-clip_value, max=clip_value)
-    total_norm = total_norm ** (1.0 / norm_type)
-    return total_norm
\ No newline at end of file
+        if hasattr(torch, "_foreach_clamp_min_"):
+            torch._foreach_clamp_min_(grads, -clip_value)
+            torch._foreach_clamp_max_(grads, clip_value)
+        else:
+            for g in grads:
+                g.clamp_(min=-clip_value, max=clip_value)
+    return total_norm
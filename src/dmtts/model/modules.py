@@ -25,7 +25,7 @@ class LayerNorm(nn.Module):
 
     def forward(self, x):
         x = x.transpose(1, -1)
-        x = F.layer_norm(x, (self.channels,), self.gamma, self.beta, self.eps)
+        x = F.layer_norm(x, (self.channels,), self.gamma.to(x.dtype), self.beta.to(x.dtype), self.eps)
         return x.transpose(1, -1)
 
 
@@ -182,12 +182,17 @@ class WN(torch.nn.Module):
             res_skip_layer = torch.nn.utils.weight_norm(res_skip_layer, name="weight")
             self.res_skip_layers.append(res_skip_layer)
 
+    def project_g(self, g):
+        if self.gin_channels == 0:
+            return None
+        return self.cond_layer(g)
+
     def forward(self, x, x_mask, g=None, **kwargs):
         output = torch.zeros_like(x)
         n_channels_tensor = torch.IntTensor([self.hidden_channels])
 
         if g is not None:
-            g = self.cond_layer(g)
+            g = commons.speaker_projection(self, g)
 
         for i in range(self.n_layers):
             x_in = self.in_layers[i](x)
@@ -498,17 +503,19 @@ class ConvFlow(nn.Module):
         )
         unnormalized_derivatives = h[..., 2 * self.num_bins :]
 
-        x1, logabsdet = piecewise_rational_quadratic_transform(
-            x1,
-            unnormalized_widths,
-            unnormalized_heights,
-            unnormalized_derivatives,
-            inverse=reverse,
-            tails="linear",
-            tail_bound=self.tail_bound,
-        )
+        # the spline math is kept in fp32 under autocast (bins, searchsorted, sqrt)
+        with torch.autocast(x.device.type, enabled=False):
+            x1, logabsdet = piecewise_rational_quadratic_transform(
+                x1.float(),
+                unnormalized_widths.float(),
+                unnormalized_heights.float(),
+                unnormalized_derivatives.float(),
+                inverse=reverse,
+                tails="linear",
+                tail_bound=self.tail_bound,
+            )
 
-        x = torch.cat([x0, x1], 1) * x_mask
+        x = torch.cat([x0.to(x1.dtype), x1], 1) * x_mask
         logdet = torch.sum(logabsdet * x_mask, [1, 2])
         if not reverse:
             return x, logdet
@@ -632,7 +639,10 @@ class ConvNeXtV2Block(nn.Module):
         self.grn = GRN(intermediate_dim)
         self.pwconv2 = nn.Linear(intermediate_dim, dim)
 
-    def forward(self, x: torch.Tensor) -> torch.Tensor:
+    def forward(self, x: torch.Tensor, x_mask: torch.Tensor = None) -> torch.Tensor:
+        # x_mask: [b, n, 1], keeps padded frames from leaking into valid ones
+        if x_mask is not None:
+            x = x * x_mask
         residual = x
         x = x.transpose(1, 2)  # b n d -> b d n
         x = self.dwconv(x)
@@ -640,7 +650,7 @@ class ConvNeXtV2Block(nn.Module):
         x = self.norm(x)
         x = self.pwconv1(x)
         x = self.act(x)
-        x = self.grn(x)
+        x = self.grn(x, x_mask)
         x = self.pwconv2(x)
         return residual + x
 
@@ -651,7 +661,9 @@ class GRN(nn.Module):
         self.gamma = nn.Parameter(torch.zeros(1, 1, dim))
         self.beta = nn.Parameter(torch.zeros(1, 1, dim))
 
-    def forward(self, x):
+    def forward(self, x, x_mask=None):
+        if x_mask is not None:
+            x = x * x_mask
         Gx = torch.norm(x, p=2, dim=1, keepdim=True)
         Nx = Gx / (Gx.mean(dim=-1, keepdim=True) + 1e-6)
         return self.gamma * (x * Nx) + self.beta + x
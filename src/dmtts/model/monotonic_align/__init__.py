@@ -1,10 +1,22 @@
 from numpy import zeros, int32, float32
 from torch import from_numpy
 
-from .core import maximum_path_jit
+from .core import maximum_path_jit, maximum_path_jit_parallel
+from .wavefront import maximum_path_torch
 
+# selected with "mas_backend" in the model config
+#   numba           sequential numba kernel on the host (default)
+#   numba_parallel  same kernel, batch items in parallel over numba's threads
+#   torch           batched DP that stays on the device (no host round trip)
+BACKENDS = ("numba", "numba_parallel", "torch")
+
+
+def maximum_path(neg_cent, mask, backend="numba"):
+    if backend == "torch":
+        return maximum_path_torch(neg_cent, mask)
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown mas_backend: {backend} (expected one of {BACKENDS})")
 
-def maximum_path(neg_cent, mask):
     device = neg_cent.device
     dtype = neg_cent.dtype
     neg_cent = neg_cent.data.cpu().numpy().astype(float32)
@@ -12,5 +24,8 @@ def maximum_path(neg_cent, mask):
 
     t_t_max = mask.sum(1)[:, 0].data.cpu().numpy().astype(int32)
     t_s_max = mask.sum(2)[:, 0].data.cpu().numpy().astype(int32)
-    maximum_path_jit(path, neg_cent, t_t_max, t_s_max)
-    return from_numpy(path).to(device=device, dtype=dtype)
\ No newline at end of file
+    if backend == "numba_parallel":
+        maximum_path_jit_parallel(path, neg_cent, t_t_max, t_s_max)
+    else:
+        maximum_path_jit(path, neg_cent, t_t_max, t_s_max)
+    return from_numpy(path).to(device=device, dtype=dtype)
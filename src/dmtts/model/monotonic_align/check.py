@@ -0,0 +1,81 @@
+# Checks every MAS backend against the reference numba kernel and times them.
+#
+#   python -m dmtts.model.monotonic_align.check
+#   python -m dmtts.model.monotonic_align.check --batch-size 32 --max-frames 800 --device cuda
+import time
+
+import click
+import torch
+
+from dmtts.model.monotonic_align import BACKENDS, maximum_path
+
+
+def random_case(batch_size, max_frames, max_phones, device, generator):
+    t_t = torch.randint(max_frames // 4, max_frames + 1, (batch_size,), generator=generator)
+    # every item needs at least as many frames as phones
+    t_s = torch.minimum(torch.randint(1, max_phones + 1, (batch_size,), generator=generator), t_t)
+    t_t[0], t_s[0] = max_frames, min(max_phones, max_frames)  # the padded shape is always reached
+    y_mask = (torch.arange(max_frames)[None] < t_t[:, None]).float()
+    x_mask = (torch.arange(max_phones)[None] < t_s[:, None]).float()
+    mask = y_mask[:, :, None] * x_mask[:, None, :]
+    neg_cent = torch.randn(batch_size, max_frames, max_phones, generator=generator) * 10 - 50
+    return neg_cent.to(device), mask.to(device)
+
+
+def check_backends(cases, batch_size, max_frames, max_phones, device, generator):
+    """
+    Number of random cases (uneven frame / phone lengths per item) on which
+    each backend's path differs from the sequential numba kernel. The first
+    half are small odd shapes, including the edge cases of one phone and of
+    as many phones as frames.
+    """
+    mismatches = {backend: 0 for backend in BACKENDS[1:]}
+    for i in range(cases):
+        if i < cases // 2:
+            b, t = 1 + i % 3, 1 + i
+            s = (1, t, 1 + i // 2)[i % 3]
+        else:
+            b, t, s = batch_size, max_frames, max_phones
+        neg_cent, mask = random_case(b, t, s, device, generator)
+        ref = maximum_path(neg_cent, mask, backend="numba")
+        for backend in mismatches:
+            if not torch.equal(maximum_path(neg_cent, mask, backend=backend), ref):
+                mismatches[backend] += 1
+    return mismatches
+
+
+def timed(fn, repeat):
+    fn()  # compile / warm up
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / repeat
+
+
+@click.command()
+@click.option("--batch-size", "-b", default=16)
+@click.option("--max-frames", default=400)
+@click.option("--max-phones", default=120)
+@click.option("--cases", default=20, help="Random cases compared per backend")
+@click.option("--repeat", default=5, help="Timing repetitions")
+@click.option("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+def main(batch_size, max_frames, max_phones, cases, repeat, device):
+    generator = torch.Generator().manual_seed(1234)
+    mismatches = check_backends(cases, batch_size, max_frames, max_phones, device, generator)
+
+    neg_cent, mask = random_case(batch_size, max_frames, max_phones, device, generator)
+    print(f"b={batch_size} t_t={max_frames} t_s={max_phones} device={device}")
+    for backend in BACKENDS:
+        elapsed = timed(lambda: maximum_path(neg_cent, mask, backend=backend), repeat)
+        compared = f"mismatches: {mismatches[backend]}/{cases}" if backend in mismatches else "reference"
+        print(f"  {backend:15s} {elapsed * 1000:8.2f} ms   {compared}")
+    if any(mismatches.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import torch
+from torch.nn import functional as F
+
+MAX_NEG_VAL = -1e9
+
+
+@torch.no_grad()
+def maximum_path_torch(neg_cent, mask):
+    """
+    `maximum_path` without leaving the device.
+
+    Row y of the DP only depends on row y - 1, so every row is one wavefront:
+    it is computed for all text positions and all batch items at once, and
+    the backtrack walks all items in parallel. Both loops run t_t steps of
+    small batched ops instead of b * t_t * t_s scalar steps on the host.
+    Matches `maximum_path_jit` exactly for float32 inputs.
+
+    neg_cent: [b, t_t, t_s]
+    mask: [b, t_t, t_s]
+    """
+    device = neg_cent.device
+    dtype = neg_cent.dtype
+    value = neg_cent.float()
+    b, t_t, t_s = value.shape
+
+    t_ys = mask.sum(1)[:, 0].long().view(b, 1)
+    t_xs = mask.sum(2)[:, 0].long().view(b, 1)
+    x = torch.arange(t_s, device=device).view(1, t_s)
+
+    # forward: value[y, x] += max(value[y - 1, x - 1], value[y - 1, x]) inside the band
+    y = torch.arange(t_t, device=device).view(1, t_t, 1)
+    band = (x.unsqueeze(1) >= (t_xs - t_ys).unsqueeze(2) + y) & (x.unsqueeze(1) < torch.minimum(t_xs.unsqueeze(2), y + 1)) & (y < t_ys.unsqueeze(2))
+    diag = x == y.view(t_t, 1)  # x == y: no previous row to stay on
+    acc = torch.empty_like(value)
+    prev = torch.full((b, t_s), MAX_NEG_VAL, device=device)
+    for i in range(t_t):
+        v_cur = prev.masked_fill(diag[i], MAX_NEG_VAL)
+        v_prev = F.pad(prev[:, :-1], (1, 0), value=0. if i == 0 else MAX_NEG_VAL)
+        prev = torch.where(band[:, i], value[:, i] + torch.maximum(v_prev, v_cur), value[:, i])
+        acc[:, i] = prev
+
+    # backtrack: at (y, index) step to index - 1 if forced or if that cell scored higher
+    step = torch.zeros((b, t_t, t_s), dtype=torch.bool, device=device)
+    if t_t > 1:
+        ys = torch.arange(1, t_t, device=device).view(1, t_t - 1, 1)
+        xs = x.view(1, 1, t_s)
+        left = torch.cat([torch.full((b, t_t - 1, 1), MAX_NEG_VAL, device=device), acc[:, :-1, :-1]], 2)
+        step[:, 1:] = (xs != 0) & ((xs == ys) | (acc[:, :-1] < left))
+
+    path = torch.zeros((b, t_t, t_s), dtype=dtype, device=device)
+    batch = torch.arange(b, device=device)
+    index = (t_xs.view(b) - 1).clamp(min=0)
+    t_ys = t_ys.view(b)
+    for y in range(t_t - 1, -1, -1):
+        active = y < t_ys
+        path[batch, y, index] = active.to(dtype)
+        index = index - (active & step[batch, y, index]).long()
+    return path
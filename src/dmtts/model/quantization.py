@@ -0,0 +1,68 @@
+import torch
+from torch import nn
+
+# parts of SynthesizerTrn that are quantized: linear / 1x1-conv heavy and cheap
+# to get slightly wrong. The vocoder is left alone: its cost is in convolutions
+# with a real kernel, which dynamic int8 quantization does not cover.
+DEFAULT_PARTS = ("enc_p", "dp", "sdp", "flow")
+
+
+class PointwiseLinear(nn.Module):
+    """A 1x1 nn.Conv1d computed as nn.Linear over channels ([b, c, t] in and out),
+    which dynamic quantization knows how to handle."""
+
+    def __init__(self, conv):
+        super().__init__()
+        self.linear = nn.Linear(conv.in_channels, conv.out_channels, bias=conv.bias is not None)
+        with torch.no_grad():
+            self.linear.weight.copy_(conv.weight[:, :, 0])
+            if conv.bias is not None:
+                self.linear.bias.copy_(conv.bias)
+
+    def forward(self, x):
+        return self.linear(x.transpose(1, 2)).transpose(1, 2)
+
+
+def is_pointwise(conv):
+    return (
+        type(conv) is nn.Conv1d
+        and conv.kernel_size == (1,)
+        and conv.stride == (1,)
+        and conv.padding in ((0,), "valid")
+        and conv.dilation == (1,)
+        and conv.groups == 1
+    )
+
+
+def pointwise_to_linear(module):
+    """Replaces every 1x1 nn.Conv1d below `module` by an equivalent `PointwiseLinear`."""
+    for parent in list(module.modules()):
+        for name, child in list(parent.named_children()):
+            if is_pointwise(child):
+                setattr(parent, name, PointwiseLinear(child))
+
+
+def quantize_dynamic_int8(model):
+    """
+    CPU dynamic int8 quantization of `model` (a SynthesizerTrn already through
+    `optimize_for_inference`, so no weight norm is left): 1x1 convs become
+    linears, then every nn.Linear of `DEFAULT_PARTS` gets int8 weights and
+    per-batch int8 activations. Convolutions with a real kernel (the bulk of
+    the vocoder) have no dynamic int8 kernel in PyTorch and stay fp32.
+    In place; returns `model`.
+    """
+    if not getattr(model, "_inference_optimized", False):
+        raise ValueError("quantize_dynamic_int8 expects a model after optimize_for_inference()")
+    engines = torch.backends.quantized.supported_engines
+    for engine in ("x86", "fbgemm", "qnnpack"):
+        if engine in engines:
+            torch.backends.quantized.engine = engine
+            break
+    for part in DEFAULT_PARTS:
+        module = getattr(model, part, None)
+        if module is None:
+            continue
+        pointwise_to_linear(module)
+        torch.ao.quantization.quantize_dynamic(module, {nn.Linear}, dtype=torch.qint8, inplace=True)
+    model.clear_speaker_cache()
+    return model
@@ -8,6 +8,7 @@ from dmtts.model import modules
 from dmtts.model import attentions
 
 import dmtts.model.monotonic_align as monotonic_align
+from dmtts.utils.profile_utils import stage
 
 
 from dmtts.model.backbones import discriminators, duration_predictors, encoders, flows, generators
@@ -82,6 +83,7 @@ class SynthesizerTrn(nn.Module):
         self.use_noise_scaled_mas = kwargs.get("use_noise_scaled_mas", False)
         self.mas_noise_scale_initial = kwargs.get("mas_noise_scale_initial", 0.01)
         self.noise_scale_delta = kwargs.get("noise_scale_delta", 2e-6)
+        self.mas_backend = kwargs.get("mas_backend", "numba")  # see monotonic_align.BACKENDS
         self.current_mas_noise_scale = self.mas_noise_scale_initial
         if self.use_spk_conditioned_encoder and gin_channels > 0:
             self.enc_gin_channels = gin_channels
@@ -163,6 +165,65 @@ class SynthesizerTrn(nn.Module):
         else:
             self.ref_enc = encoders.ReferenceEncoder(spec_channels, gin_channels, layernorm=norm_refenc)
         self.use_vc = use_vc
+        self._speaker_conditions = {}  # speaker id -> commons.SpeakerCondition
+        self._inference_optimized = False
+
+    def speaker_condition(self, speaker_ids):
+        """
+        `commons.SpeakerCondition` for a batch of speaker ids (one per row), to be
+        passed as `g=` to `infer` / `infer_stream`. Every g-dependent projection
+        (text encoder, duration predictors, flow, decoder) is computed once per
+        speaker and cached; the cache is dropped when weights are reloaded or the
+        model is moved / cast. Call `clear_speaker_cache()` after editing weights
+        in place. None for reference-encoder models, whose g depends on the audio.
+        """
+        if self.n_speakers <= 0:
+            return None
+        conditions = []
+        for speaker_id in speaker_ids:
+            speaker_id = int(speaker_id)
+            condition = self._speaker_conditions.get(speaker_id)
+            if condition is None:
+                sid = torch.LongTensor([speaker_id]).to(self.emb_g.weight.device)
+                with torch.no_grad():
+                    g = self.emb_g(sid).unsqueeze(-1)  # [1, h, 1]
+                condition = commons.SpeakerCondition.precompute(self, g)
+                self._speaker_conditions[speaker_id] = condition
+            conditions.append(condition)
+        return commons.SpeakerCondition.cat(conditions)
+
+    @torch.no_grad()
+    def optimize_for_inference(self):
+        """
+        Turns the model into an inference-only one, in place and irreversibly:
+        drops the posterior encoder (training only), folds weight norm into
+        plain weights, fuses the q / k / v projections of every attention
+        layer and replaces dropout by identity. The result can neither be
+        trained nor load training checkpoints. Idempotent.
+        """
+        if self._inference_optimized:
+            return self
+        self.enc_q = None
+        commons.fold_weight_norm(self)
+        commons.remove_dropout(self)
+        for module in list(self.modules()):
+            if isinstance(module, attentions.MultiHeadAttention):
+                module.fuse_qkv()
+        self.clear_speaker_cache()
+        self._inference_optimized = True
+        return self.eval()
+
+    def clear_speaker_cache(self):
+        self._speaker_conditions = {}
+
+    def _apply(self, fn, *args, **kwargs):
+        # .to() / .half() / .cuda(): cached projections would keep the old device / dtype
+        self.clear_speaker_cache()
+        return super()._apply(fn, *args, **kwargs)
+
+    def load_state_dict(self, *args, **kwargs):
+        self.clear_speaker_cache()
+        return super().load_state_dict(*args, **kwargs)
 
 
     #def forward(self, x, x_lengths, y, y_lengths, sid, tone, language, bert, ja_bert):
@@ -221,7 +282,7 @@ class SynthesizerTrn(nn.Module):
 
             attn_mask = torch.unsqueeze(x_mask, 2) * torch.unsqueeze(y_mask, -1)
             attn = (
-                monotonic_align.maximum_path(neg_cent, attn_mask.squeeze(1))
+                monotonic_align.maximum_path(neg_cent, attn_mask.squeeze(1), backend=self.mas_backend)
                 .unsqueeze(1)
                 .detach()
             )
@@ -274,6 +335,90 @@ class SynthesizerTrn(nn.Module):
         sdp_ratio=0,
         y=None,
         g=None,
+        return_attn=False,
+    ):
+        """
+        The returned alignment `attn` ([b, 1, t_y, t_x]) is None unless
+        `return_attn`: the prior is expanded without materializing it.
+        """
+        z, g, attn, y_mask, (z_p, m_p, logs_p) = self.infer_latent(
+            x,
+            x_lengths,
+            sid,
+            tone,
+            language,
+            noise_scale=noise_scale,
+            length_scale=length_scale,
+            noise_scale_w=noise_scale_w,
+            sdp_ratio=sdp_ratio,
+            y=y,
+            g=g,
+            return_attn=return_attn,
+        )
+        dec_mask = y_mask[:, :, :max_len] if x.size(0) > 1 else None
+        with stage("dec"):
+            o = self.dec((z * y_mask)[:, :, :max_len], g=g, x_mask=dec_mask)
+        # print('max/min of o:', o.max(), o.min())
+        return o, attn, y_mask, (z, z_p, m_p, logs_p)
+
+    def infer_stream(
+        self,
+        x,
+        x_lengths,
+        sid,
+        tone,
+        language,
+        noise_scale=0.667,
+        length_scale=1,
+        noise_scale_w=0.8,
+        sdp_ratio=0,
+        y=None,
+        g=None,
+        chunk_size=32,
+        context=None,
+    ):
+        """
+        Same as `infer` for a single utterance, but the flow runs once and the
+        decoder output is yielded in windows of `chunk_size` latent frames.
+        """
+        assert x.size(0) == 1, "infer_stream supports batch size 1 only"
+        z, g, _, y_mask, _ = self.infer_latent(
+            x,
+            x_lengths,
+            sid,
+            tone,
+            language,
+            noise_scale=noise_scale,
+            length_scale=length_scale,
+            noise_scale_w=noise_scale_w,
+            sdp_ratio=sdp_ratio,
+            y=y,
+            g=g,
+        )
+        chunks = self.dec.decode_chunks(
+            z * y_mask, g=g, chunk_size=chunk_size, context=context
+        )
+        while True:
+            with stage("dec"):
+                o = next(chunks, None)
+            if o is None:
+                return
+            yield o
+
+    def infer_latent(
+        self,
+        x,
+        x_lengths,
+        sid,
+        tone,
+        language,
+        noise_scale=0.667,
+        length_scale=1,
+        noise_scale_w=0.8,
+        sdp_ratio=0,
+        y=None,
+        g=None,
+        return_attn=False,
     ):
         # x, m_p, logs_p, x_mask = self.enc_p(x, x_lengths, tone, language, bert)
         # g = self.gst(y)
@@ -287,34 +432,69 @@ class SynthesizerTrn(nn.Module):
             g_p = None
         else:
             g_p = g
-        x, m_p, logs_p, x_mask = self.enc_p(
-            x, x_lengths, tone, g=g_p
-        )
-        logw = self.sdp(x, x_mask, g=g, reverse=True, noise_scale=noise_scale_w) * (
-            sdp_ratio
-        ) + self.dp(x, x_mask, g=g) * (1 - sdp_ratio)
-        w = torch.exp(logw) * x_mask * length_scale
-        
-        w_ceil = torch.ceil(w)
-        y_lengths = torch.clamp_min(torch.sum(w_ceil, [1, 2]), 1).long()
-        y_mask = torch.unsqueeze(commons.sequence_mask(y_lengths, None), 1).to(
-            x_mask.dtype
-        )
-        attn_mask = torch.unsqueeze(x_mask, 2) * torch.unsqueeze(y_mask, -1)
-        attn = commons.generate_path(w_ceil, attn_mask)
-
-        m_p = torch.matmul(attn.squeeze(1), m_p.transpose(1, 2)).transpose(
-            1, 2
-        )  # [b, t', t], [b, t, d] -> [b, d, t']
-        logs_p = torch.matmul(attn.squeeze(1), logs_p.transpose(1, 2)).transpose(
-            1, 2
-        )  # [b, t', t], [b, t, d] -> [b, d, t']
-
-        z_p = m_p + torch.randn_like(m_p) * torch.exp(logs_p) * noise_scale
-        z = self.flow(z_p, y_mask, g=g, reverse=True)
-        o = self.dec((z * y_mask)[:, :, :max_len], g=g)
-        # print('max/min of o:', o.max(), o.min())
-        return o, attn, y_mask, (z, z_p, m_p, logs_p)
+        with stage("enc_p"):
+            x, m_p, logs_p, x_mask = self.enc_p(
+                x, x_lengths, tone, g=g_p
+            )
+        with stage("duration"):
+            # only the predictor(s) with a nonzero weight are evaluated:
+            # sdp_ratio=0 is deterministic only, sdp_ratio=1 stochastic only
+            use_dp, use_sdp = sdp_ratio != 1, sdp_ratio != 0
+            logw_dp = self.dp(x, x_mask, g=g) if use_dp else None
+
+            # Padded batches: every row draws its SDP and prior noise in the same
+            # order and shape as an unbatched call would, so row i of a batch is
+            # reproducible against serial inference under the same seed.
+            # durations stay fp32 under reduced precision: exp / ceil / cumsum of
+            # frame counts are not exact in bf16 / fp16 beyond a few hundred frames
+            b = x.size(0)
+            w_ceil = torch.zeros_like(x_mask, dtype=torch.float)
+            eps = []
+            for i in range(b):
+                t_x = int(x_lengths[i])
+                x_i, x_mask_i = x[i : i + 1, :, :t_x], x_mask[i : i + 1, :, :t_x]
+                logw = 0
+                if use_sdp:
+                    logw = self.sdp(
+                        x_i, x_mask_i, g=g[i : i + 1], reverse=True, noise_scale=noise_scale_w
+                    ) * (sdp_ratio)
+                if use_dp:
+                    logw = logw + logw_dp[i : i + 1, :, :t_x] * (1 - sdp_ratio)
+                w = torch.exp(logw.float()) * x_mask_i.float() * length_scale
+                w_ceil[i : i + 1, :, :t_x] = torch.ceil(w)
+                t_y = int(torch.clamp_min(torch.sum(w_ceil[i]), 1))
+                # same memory layout as randn_like() on the expanded (transposed) m_p
+                eps.append(
+                    torch.empty(1, t_y, m_p.size(1), device=m_p.device, dtype=torch.float)
+                    .transpose(1, 2)
+                    .normal_()
+                )
+
+        with stage("generate_path"):
+            y_lengths = torch.clamp_min(torch.sum(w_ceil, [1, 2]), 1).long()
+            y_mask = torch.unsqueeze(commons.sequence_mask(y_lengths, None), 1).to(
+                x_mask.dtype
+            )
+            # expand the prior by gathering each frame's phone, O(t_y * d);
+            # the dense [b, 1, t_y, t_x] alignment is only built on request
+            m_p, logs_p = commons.expand_by_durations(
+                torch.cat([m_p, logs_p], 1), w_ceil, max_length=y_mask.size(2)
+            ).split(m_p.size(1), 1)  # [b, d, t], [b, 1, t] -> [b, d, t']
+            attn = None
+            if return_attn:
+                attn_mask = torch.unsqueeze(x_mask, 2) * torch.unsqueeze(y_mask, -1)
+                attn = commons.generate_path(w_ceil, attn_mask.float())  # fp32
+
+        if b == 1:
+            noise = eps[0]
+        else:
+            noise = torch.zeros_like(m_p, dtype=torch.float)
+            for i, eps_i in enumerate(eps):
+                noise[i, :, : eps_i.size(2)] = eps_i[0]
+        with stage("flow"):
+            z_p = m_p + noise * torch.exp(logs_p) * noise_scale
+            z = self.flow(z_p, y_mask, g=g, reverse=True)
+        return z, g, attn, y_mask, (z_p, m_p, logs_p)
 
     def voice_conversion(self, y, y_lengths, sid_src, sid_tgt, tau=1.0):        
         g_src = sid_src
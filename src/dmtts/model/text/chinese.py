@@ -62,6 +62,11 @@ def replace_punctuation(text):
     return replaced_text
 
 
+# jieba segmentation and tone sandhi depend on neighbouring words, so only whole
+# sentences are cached, see `G2PCache`
+G2P_CACHE_GRANULARITY = "sentence"
+
+
 def g2p(text):
     """중국어 문장을 받아서 phones, tones만 반환"""
     pattern = r"(?<=[{0}])\s*".format("".join(punctuation))
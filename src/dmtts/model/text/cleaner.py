@@ -1,9 +1,126 @@
 from importlib import import_module
-from functools import lru_cache
+from functools import lru_cache, wraps
+from collections import OrderedDict
+import os
+import json
+import threading
 import dmtts.model.text.symbols as symbols
 from dmtts.model.text.symbols import cleaned_text_to_sequence
+from dmtts.utils.profile_utils import stage
 import copy
 
+
+class G2PCache:
+    """
+    LRU memo of g2p results keyed by (language, segment), shared by all languages.
+
+    What a segment is depends on the language module's `G2P_CACHE_GRANULARITY`:
+      "word"      the module memoizes its own per-word g2p with `g2p_cache.memoize(LANG)`
+                  (words are converted independently there, e.g. EN/KR)
+      "sentence"  `clean_text` memoizes the whole `g2p(norm_text)` call
+                  (context crosses word boundaries, e.g. ZH tone sandhi, MeCab)
+      None        not cached
+    maxsize=0 disables the cache.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_or_compute(self, language, segment, fn):
+        """Returns fn(segment) as (phones, tones) lists, computing it on a miss."""
+        if self.maxsize <= 0:
+            return fn(segment)
+        key = (language, segment)
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+        if value is None:
+            phones, tones = fn(segment)
+            value = (tuple(phones), tuple(tones))
+            with self._lock:
+                self.misses += 1
+                self._data[key] = value
+                self._data.move_to_end(key)
+                self._evict()
+        # callers get fresh lists, the cached tuples stay untouched
+        return list(value[0]), list(value[1])
+
+    def memoize(self, language):
+        """Decorator for a module's `word -> (phones, tones)` function."""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(segment):
+                return self.get_or_compute(language, segment, fn)
+            return wrapper
+        return decorator
+
+    def _evict(self):
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def resize(self, maxsize):
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.,
+        }
+
+    def save(self, path):
+        """Write the entries (least recently used first) as JSON; atomic via rename."""
+        with self._lock:
+            entries = [[lang, seg, list(ph), list(tn)] for (lang, seg), (ph, tn) in self._data.items()]
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return len(entries)
+
+    def load(self, path):
+        """Preload entries written by `save`; later (more recent) entries win."""
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+        with self._lock:
+            for lang, seg, ph, tn in entries:
+                self._data[(lang, seg)] = (tuple(ph), tuple(tn))
+                self._data.move_to_end((lang, seg))
+            self._evict()
+        return len(entries)
+
+
+g2p_cache = G2PCache()
+
+def configure_g2p_cache(maxsize=None, path=None):
+    """Resize the shared cache and/or preload it from a file written by `g2p_cache.save`."""
+    if maxsize is not None:
+        g2p_cache.resize(maxsize)
+    if path is not None and os.path.exists(path):
+        g2p_cache.load(path)
+    return g2p_cache
+
+
 @lru_cache(maxsize=None)
 def get_language_module(language_code: str):
     """symbols.LANG 안의 module 경로 문자열로 실제 모듈을 lazy import."""
@@ -21,8 +138,13 @@ def clean_text(text: str, language: str):
     language_module= get_language_module(language)
     if language_module is None:
         raise ValueError(f"Unsupported language (no module): {language}")
-    norm_text = language_module.text_normalize(text)
-    phones, tones = language_module.g2p(norm_text)
+    with stage("text_normalize"):
+        norm_text = language_module.text_normalize(text)
+    with stage("g2p"):
+        if getattr(language_module, "G2P_CACHE_GRANULARITY", None) == "sentence":
+            phones, tones = g2p_cache.get_or_compute(language, norm_text, language_module.g2p)
+        else:
+            phones, tones = language_module.g2p(norm_text)
     return norm_text, phones, tones, 
 
 
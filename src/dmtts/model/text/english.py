@@ -7,6 +7,7 @@ from g2p_en import G2p
 from dmtts.model.text.english_utils.abbreviations import expand_abbreviations, expand_initialisms, additional_replacement, expand_units, expand_special_tokens
 from dmtts.model.text.english_utils.time_norm import expand_time_english
 from dmtts.model.text.english_utils.number_norm import normalize_numbers
+from dmtts.model.text.cleaner import g2p_cache
 
 current_file_path = os.path.dirname(__file__)
 CMU_DICT_PATH = os.path.join(current_file_path, "cmudict.rep")
@@ -192,28 +193,41 @@ def text_normalize(text):
     return text
 
 
+# words are converted independently, see `G2PCache`
+G2P_CACHE_GRANULARITY = "word"
+
+
+@g2p_cache.memoize("EN")
+def word_g2p(w):
+    phones = []
+    tones = []
+    if w.upper() in eng_dict:  # CMUdict에 있으면
+        phns, tns = refine_syllables(eng_dict[w.upper()])
+        phones += phns
+        tones += tns
+    else:  # 없으면 g2p-en 이용
+        phone_list = list(filter(lambda p: p != " ", _g2p(w)))
+        for ph in phone_list:
+            if ph in arpa:
+                ph, tn = refine_ph(ph)
+                phones.append(ph)
+                tones.append(tn)
+            else:
+                phones.append(ph)
+                tones.append(0)
+    phones = [post_replace_ph(i) for i in phones]
+    return phones, tones
+
+
 def g2p(text, pad_start_end=True):
     phones = []
     tones = []
 
     words = text.split()
     for w in words:
-        if w.upper() in eng_dict:  # CMUdict에 있으면
-            phns, tns = refine_syllables(eng_dict[w.upper()])
-            phones += phns
-            tones += tns
-        else:  # 없으면 g2p-en 이용
-            phone_list = list(filter(lambda p: p != " ", _g2p(w)))
-            for ph in phone_list:
-                if ph in arpa:
-                    ph, tn = refine_ph(ph)
-                    phones.append(ph)
-                    tones.append(tn)
-                else:
-                    phones.append(ph)
-                    tones.append(0)
-
-    phones = [post_replace_ph(i) for i in phones]
+        phns, tns = word_g2p(w)
+        phones += phns
+        tones += tns
 
 
     if pad_start_end:
@@ -270,6 +270,10 @@ def split_digits(token_str: str):
     """
     return list(token_str)
 
+# MeCab tokenizes the whole sentence, so only whole sentences are cached, see `G2PCache`
+G2P_CACHE_GRANULARITY = "sentence"
+
+
 def g2p(text: str):
     text = unicodedata.normalize("NFKC", text)
     text = text_normalize(text)
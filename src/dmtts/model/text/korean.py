@@ -5,11 +5,16 @@ import unicodedata
 from dmtts.model.text.kr_normalizer import N2gk, N2gkPlus
 # from anyascii import anyascii
 from jamo import hangul_to_jamo
+from dmtts.model.text.cleaner import g2p_cache
 
+n2gk_plus = None
 def normalize(text, use_n2gk_plus=True):
+    global n2gk_plus  # pylint: disable=global-statement
     text = text.strip()
     if use_n2gk_plus:
-        n2gk_plus = N2gkPlus()
+        # built once: normalize() also runs once per word inside g2p()
+        if n2gk_plus is None:
+            n2gk_plus = N2gkPlus()
         return n2gk_plus(text)
 
     return text
@@ -64,6 +69,16 @@ def distribute_phone(n_phone, n_word):
     return phones_per_word
 
 
+# words are converted independently (delimit_word=True), see `G2PCache`
+G2P_CACHE_GRANULARITY = "word"
+
+
+@g2p_cache.memoize("KR")
+def word_g2p(word):
+    phs = list(korean_text_to_phonemes(word))
+    return phs, [0] * len(phs)
+
+
 def g2p(norm_text, add_space=False, delimit_word=True):
 
     phs = []
@@ -72,8 +87,8 @@ def g2p(norm_text, add_space=False, delimit_word=True):
         for idx, word in enumerate(words):
             if not word:
                 continue
-            phonemes = korean_text_to_phonemes(word)
-            phs += list(phonemes)
+            phonemes, _ = word_g2p(word)
+            phs += phonemes
             if add_space:
                 if idx < len(words) - 1:
                     phs.append("SP")
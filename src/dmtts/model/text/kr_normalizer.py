@@ -45,6 +45,22 @@ class N2gk:
         r'(?<!\d)(10)\s*월': '시월',
     }
 
+    # ------------------- Compiled Patterns -------------------
+    # compiled once per class instead of looked up in re's cache on every call
+    _EXCEPTION_RES = [(re.compile(pattern), replacement) for pattern, replacement in EXCEPTION_CASES.items()]
+    _ENGLISH_NUMBER_RE = re.compile(r'([a-zA-Z]+)(\d+)')
+    _DIGITS_RE = re.compile(r'(\d{1,})')
+    _PHONE_HYPHEN_RE = re.compile(r'(?<!\d)(\d{3})-(\d{3,4})-(\d{4})(?!\d)')
+    _PHONE_FULL_RE = re.compile(r'(?<!\d)(\d{11})(?!\d)')
+    _PURE_NUMBER_RE = re.compile(r'(?<![\d가-힣])(\d{1,3}(?:,\d{3})*|\d+)(?![\d가-힣])')
+    _ANY_NUMBER_RE = re.compile(r'(\d{1,3}(?:,\d{3})*|\d+)')
+    _WORD_BEFORE_NUMBER_RE = re.compile(r'([가-힣a-zA-Z])(\d)')
+    _NUMBER_BEFORE_WORD_RE = re.compile(r'(\d)([가-힣a-zA-Z])')
+    _RANGE_RE = re.compile(r'(\d{1,3}(?:,\d{3})*|\d+(?:\.\d+)?)\s*~\s*(\d{1,3}(?:,\d{3})*|\d+(?:\.\d+)?)\s*([가-힣a-zA-Z]+)')
+    _NUMBER_WITH_WORD_RE = re.compile(r'(\d{1,3}(?:,\d{3})*|\d+(?:\.\d+)?)\s?([가-힣a-zA-Z]+)')
+    _FLOAT_RE = re.compile(r'(\d+\.\d+)')
+    _COMMA_NUMBERS_WITH_UNIT_RE = re.compile(r'((\d{1,3})(?:\s*,\s*\d{1,3})+)\s*([가-힣]+)')
+
 
     def __init__(self, natural=True):
         self.natural = natural
@@ -84,11 +100,13 @@ class N2gk:
                 pairs.append((unit, cat))
         # Sort by length of unit name in descending order
         self.unit_category_pairs = sorted(pairs, key=lambda x: len(x[0]), reverse=True)
+        # "starts with any unit" as one anchored match
+        self._unit_prefix_re = re.compile('|'.join(re.escape(unit) for unit, _ in self.unit_category_pairs))
 
     # ------------------- Conversion Functions -------------------
 
     def convert_english_number(self, text: str) -> str:
-        pattern = r'([a-zA-Z]+)(\d+)'  # English + number pattern
+        # English + number pattern
 
         def replacer(match):
             english_part = match.group(1)  # English part (e.g., K)
@@ -104,7 +122,7 @@ class N2gk:
             return f"{english_part} {number_in_korean}"
 
         # Convert text using regular expressions
-        return re.sub(pattern, replacer, text)
+        return self._ENGLISH_NUMBER_RE.sub(replacer, text)
 
     def to_gooyo(self, num, prefix=False):
         if num <= 9:
@@ -266,10 +284,7 @@ class N2gk:
         # -------------------- Helper: UNIT 여부 --------------------
         def starts_with_unit(next_text: str) -> bool:
             """숫자 바로 뒤에 오는 글자가 unit인지 확인"""
-            for unit, cat in self.unit_category_pairs:  # 이미 정렬된 리스트
-                if next_text.startswith(unit):
-                    return True
-            return False
+            return self._unit_prefix_re.match(next_text) is not None
 
         # -------------------- Helper: digit-reading 조건 --------------------
         def should_read_digit(num_str: str) -> bool:
@@ -285,8 +300,7 @@ class N2gk:
             return False
 
         # -------------------- Main Regex --------------------
-        # 숫자 전체를 잡는 정규식: 1~N 자리 숫자
-        pattern = r'(\d{1,})'
+        # 숫자 전체를 잡는 정규식: 1~N 자리 숫자 (_DIGITS_RE)
 
         def replacer(match):
             num_str = match.group(1)
@@ -307,7 +321,7 @@ class N2gk:
             return num_str
 
         # -------------------- 변환 실행 --------------------
-        return re.sub(pattern, replacer, text)
+        return self._DIGITS_RE.sub(replacer, text)
     
     # ------------------- Practical Parsing Functions -------------------
     def convert_phone_numbers(self, text: str) -> str:
@@ -316,9 +330,6 @@ class N2gk:
         def convert_number_str_to_korean(num_str: str) -> str:
             return ''.join([DIGIT_KOR[int(d)] for d in num_str])
 
-        pattern_hyphen = r'(?<!\d)(\d{3})-(\d{3,4})-(\d{4})(?!\d)'
-        pattern_full = r'(?<!\d)(\d{11})(?!\d)'
-
         def hyphen_replacer(match):
             return f"{convert_number_str_to_korean(match.group(1))}-{convert_number_str_to_korean(match.group(2))}-{convert_number_str_to_korean(match.group(3))}"
 
@@ -326,47 +337,43 @@ class N2gk:
             num = match.group(1)
             return f"{convert_number_str_to_korean(num[:3])}-{convert_number_str_to_korean(num[3:7])}-{convert_number_str_to_korean(num[7:])}"
 
-        text = re.sub(pattern_hyphen, hyphen_replacer, text)
-        text = re.sub(pattern_full, full_replacer, text)
+        text = self._PHONE_HYPHEN_RE.sub(hyphen_replacer, text)
+        text = self._PHONE_FULL_RE.sub(full_replacer, text)
         print(f"text: {text}")
         return text
 
     def apply_exceptions(self, text: str) -> str:
-        for pattern, replacement in self.EXCEPTION_CASES.items():
-            text = re.sub(pattern, replacement, text)
+        for pattern, replacement in self._EXCEPTION_RES:
+            text = pattern.sub(replacement, text)
         return text
 
     def convert_pure_numbers(self, text: str) -> str:
-        pattern = r'(?<![\d가-힣])(\d{1,3}(?:,\d{3})*|\d+)(?![\d가-힣])'
         #pattern = r'(?<![\d가-힣])(\d{1,3}(?:,\d{3})*|\d+)'
 
         def replacer(m):
             num = int(m.group(1).replace(',', ''))
             return self.to_hanja(num, natural=self.natural)
 
-        return re.sub(pattern, replacer, text)
+        return self._PURE_NUMBER_RE.sub(replacer, text)
 
     def convert_numbers_whatever(self, text: str) -> str:
-        pattern = r'(\d{1,3}(?:,\d{3})*|\d+)'
         #pattern = r'(?<![\d가-힣])(\d{1,3}(?:,\d{3})*|\d+)'
 
         def replacer(m):
             num = int(m.group(1).replace(',', ''))
             return self.to_hanja(num, natural=self.natural)
 
-        return re.sub(pattern, replacer, text)
+        return self._ANY_NUMBER_RE.sub(replacer, text)
 
     def insert_space_around_numbers(self,text: str) -> str:
         # Add space before Korean/English attached to a number
-        text = re.sub(r'([가-힣a-zA-Z])(\d)', r'\1 \2', text)
+        text = self._WORD_BEFORE_NUMBER_RE.sub(r'\1 \2', text)
         # Add space after a number attached to Korean/English
-        text = re.sub(r'(\d)([가-힣a-zA-Z])', r'\1 \2', text)
+        text = self._NUMBER_BEFORE_WORD_RE.sub(r'\1 \2', text)
         return text
 
 
     def parse_and_convert_sentence_with_range(self, sentence: str) -> str:
-        range_pattern = r'(\d{1,3}(?:,\d{3})*|\d+(?:\.\d+)?)\s*~\s*(\d{1,3}(?:,\d{3})*|\d+(?:\.\d+)?)\s*([가-힣a-zA-Z]+)'
-
         def range_replacer(match): # Since numbers have a ',' every 3 digits
             left_raw = match.group(1).replace(',', '')
             right_raw = match.group(2).replace(',', '')
@@ -386,14 +393,12 @@ class N2gk:
             except:
                 return match.group(0)
 
-        sentence = re.sub(range_pattern, range_replacer, sentence)
+        sentence = self._RANGE_RE.sub(range_replacer, sentence)
         #print(f"n2gk(range replacer) : {sentence}")
         return self.parse_and_convert_sentence(sentence)
 
 
     def parse_and_convert_sentence(self, sentence: str) -> str:
-        pattern = r'(\d{1,3}(?:,\d{3})*|\d+(?:\.\d+)?)\s?([가-힣a-zA-Z]+)'
-
         def replacer(match):
             raw_number = match.group(1).replace(',', '')
             #print(f"n2gk replacer (raw number) : {raw_number}")
@@ -422,12 +427,10 @@ class N2gk:
 
             return match.group(0)
 
-        return re.sub(pattern, replacer, sentence)
+        return self._NUMBER_WITH_WORD_RE.sub(replacer, sentence)
 
 
     def convert_float_numbers(self, text: str) -> str:
-        pattern = r'(\d+\.\d+)'
-
         def replacer(match):
             num_str = match.group(1)
             try:
@@ -440,11 +443,10 @@ class N2gk:
             except:
                 return num_str
 
-        return re.sub(pattern, replacer, text)
+        return self._FLOAT_RE.sub(replacer, text)
 
     def convert_comma_separated_numbers_with_unit(self, text: str) -> str:
         # e.g., "7, 8시" → "일곱, 여덟 시"
-        pattern = r'((\d{1,3})(?:\s*,\s*\d{1,3})+)\s*([가-힣]+)'
 
         def replacer(match):
             number_part = match.group(1)  # "7, 8"
@@ -459,7 +461,7 @@ class N2gk:
             #return ', '.join(results) + ' ' + unit
             return ', '.join(results) + unit
 
-        return re.sub(pattern, replacer, text)
+        return self._COMMA_NUMBERS_WITH_UNIT_RE.sub(replacer, text)
 
 
     def __call__(self, sentence: str) -> str: ## super().__call__(sentence)
@@ -691,6 +693,33 @@ class N2gkPlus(N2gk):
 
     #HISTORY_EVENT_MAPPING = 
 
+    REMOVE_SYMBOL_MAP = {
+        "<": "", ">": "", "=": "", "[": "", "]": "",
+        "《": "", "》": "", "△": "", "＞": "", "＜": "",
+        "‘": "", "’": "", "`": "", "”": "", "●": "",
+        "≪": "", "≫": "", "「": "", "」": "", "/": "",
+        "·": " ", "…": "", "▷": "",
+        "(": "", ")": "", "㈜": "", "�": "",
+        "ú": "", "◆": "", "ㆍ": "", "\n": "", #"_x000D_": "",
+
+        #"": "", "": "",
+        "×": "", "°": "", "±": "", "•": "", "™": "",
+        "®": "", "©": "",
+        "\"": ""
+
+    }
+
+    _REMOVE_SYMBOL_TABLE = str.maketrans(REMOVE_SYMBOL_MAP)
+    _PARENTHESES_RE = re.compile(r"\([^)]*\)")
+    _ENG_KOR_RE = re.compile(r'([a-zA-Z])([가-힣])')
+    _KOR_ENG_RE = re.compile(r'([가-힣])([a-zA-Z])')
+    _DOTTED_NUMBER_RE = re.compile(r'(?P<num>\d+(?:\.\d+)+)')
+    _WORD_RE = re.compile(r'\b(\S+?)\b')
+    _SINGLE_KOREAN_RE = re.compile(r'([' + re.escape(''.join(SINGLE_KOREAN_MAPPING.keys())) + r']+)')
+    _SINGLE_KOREAN_TABLE = str.maketrans(SINGLE_KOREAN_MAPPING)
+    _SINGLE_LETTER_TABLE = str.maketrans(SINGLE_LETTER_MAPPING)
+    _HISTORY_KEYS = ['사건','혁명','절','전쟁','선언','운동', '항쟁','독립','민주화', '진상', '정변','군사' ]
+
     def __init__(self, natural=True):
      
         super().__init__(natural)
@@ -703,88 +732,61 @@ class N2gkPlus(N2gk):
             #**self.SINGLE_LETTER_MAPPING
             #**self.SPECIAL_SYMBOL_MAPPING
         }
+        # one alternation pass instead of one re.sub per key; longer keys first,
+        # so a key never shadows a longer one starting at the same place
+        self._word_mapping_re = re.compile(
+            r'\b(?:' + '|'.join(re.escape(k) for k in sorted(self.WORD_MAPPING, key=len, reverse=True)) + r')\b'
+        )
+        self._unit_keys = {u for cat in self.UNIT_CATEGORIES for u in cat.units}
 
     def apply_special_symbol_mapping(self, text: str) -> str:
     
+        # literal keys applied in dict order ("%p" before "%"): plain str.replace, no regex
         for symbol, replacement in self.SPECIAL_SYMBOL_MAPPING.items():
-            text = re.sub(re.escape(symbol), replacement, text)
+            text = text.replace(symbol, replacement)
         return text
 
     def remove_symbols(self, text: str, erase_in_parentheses=True) -> str:
         # Remove all content within parentheses (including parentheses themselves)
         if erase_in_parentheses:
-            text = re.sub(r"\([^)]*\)", "", text)
-
-       
-        char_map = {
-            "<": "", ">": "", "=": "", "[": "", "]": "",
-            "《": "", "》": "", "△": "", "＞": "", "＜": "",
-            "‘": "", "’": "", "`": "", "”": "", "●": "",
-            "≪": "", "≫": "", "「": "", "」": "", "/": "",
-            "·": " ", "…": "", "▷": "",
-            "(": "", ")": "", "㈜": "", "�": "",
-            "ú": "", "◆": "", "ㆍ": "", "\n": "", #"_x000D_": "",
-
-            #"": "", "": "",
-            "×": "", "°": "", "±": "", "•": "", "™": "",
-            "®": "", "©": "",
-            "\"": ""
+            text = self._PARENTHESES_RE.sub("", text)
 
-        }
 
-      
-        translation_table = str.maketrans(char_map)
-
-#      
-        text = text.translate(translation_table)
+        text = text.translate(self._REMOVE_SYMBOL_TABLE)
         return text
 
     def apply_word_mapping(self, text: str) -> str:
         # Add space between English and Korean words
         # print(f"APPLY_WORD_MAPPING")
         # print(f"text: {text}")
-        text = re.sub(r'([a-zA-Z])([가-힣])', r'\1 \2', text)
-        text = re.sub(r'([가-힣])([a-zA-Z])', r'\1 \2', text)
+        text = self._ENG_KOR_RE.sub(r'\1 \2', text)
+        text = self._KOR_ENG_RE.sub(r'\1 \2', text)
 
         # print(f"text: {text}")
         # COMPANY_MAPPING 단어 단위 매핑
-        for eng, kor in self.WORD_MAPPING.items():
-            pattern = r'\b{}\b'.format(re.escape(eng))
-            text = re.sub(pattern, kor, text)
+        text = self._word_mapping_re.sub(lambda m: self.WORD_MAPPING[m.group(0)], text)
         # print(f"after word_mapping text: {text}")
-        text = ''.join([self.SINGLE_LETTER_MAPPING.get(c, c) for c in text])
+        text = text.translate(self._SINGLE_LETTER_TABLE)
         # print(f"after singgle letter mapping text: {text}")
 
         return text
 
     def apply_single_korean_mapping(self, text: str) -> str:
         
-      
-        pattern_seq = r'([' + re.escape(''.join(self.SINGLE_KOREAN_MAPPING.keys())) + r']+)'
-
-        def seq_replacer(match):
-            seq = match.group(0)
-            
-            return ''.join(self.SINGLE_KOREAN_MAPPING.get(char, char) for char in seq)
-
-        
-        text = re.sub(pattern_seq, seq_replacer, text)
-        return text
+        # runs of jamo consonants are spelled out in one pass
+        return self._SINGLE_KOREAN_RE.sub(lambda m: m.group(0).translate(self._SINGLE_KOREAN_TABLE), text)
 
 
     def convert_history_event(self, text: str) -> str:
-        history_keys = ['사건','혁명','절','전쟁','선언','운동', '항쟁','독립','민주화', '진상', '정변','군사' ]
-        unit_keys    = {u for cat in self.UNIT_CATEGORIES for u in cat.units}
-
-        
-        pat = re.compile(r'(?P<num>\d+(?:\.\d+)+)')
+        history_keys = self._HISTORY_KEYS
+        unit_keys    = self._unit_keys
 
         def _repl(m):
             num_dot = m.group('num')
             tail    = text[m.end():]
 
            
-            words = re.findall(r'\b(\S+?)\b', tail)[:3]
+            words = self._WORD_RE.findall(tail)[:3]
 
             first_tag = None
             for w in words:
@@ -803,7 +805,7 @@ class N2gkPlus(N2gk):
            
             return num_dot
 
-        return pat.sub(_repl, text)
+        return self._DOTTED_NUMBER_RE.sub(_repl, text)
 
     def __call__(self, sentence: str) -> str:
         sentence = self.remove_symbols(sentence)
@@ -82,6 +82,10 @@ def text_normalize(text):
     print(f"text: {text}")
     return text
 
+# a per-character table lookup, cheaper than a cache lookup
+G2P_CACHE_GRANULARITY = None
+
+
 def g2p(norm_text: str):
     """
     Russian pseudo-G2P (character-level with stress tones).
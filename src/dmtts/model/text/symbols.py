@@ -1,4 +1,5 @@
 import copy
+from functools import lru_cache
 
 punctuation = [" ", "!", "?", "…", ",", ".", "'", "-"]
 #punctuation = ["!", "?", "…", ",", ".", "'", "-"] 
@@ -192,40 +193,60 @@ def get_prefix_cleaned_text(cleaned_text, language):
 
 
 
-def cleaned_text_to_sequence(cleaned_text, tones, language, lang_list=None, add_prefix_language=False, skip_no_symbol_when_infernce=True):
+class SymbolEncoder:
+    """
+    `cleaned_text_to_sequence` with its lookup tables built once.
+
+    The symbol / tone / language tables only depend on
+    (lang_list, add_prefix_language, sort_symbols); use `get_encoder()` to share
+    one instance per key instead of rebuilding them for every sentence.
+    """
+
+    def __init__(self, lang_list=None, add_prefix_language=False, sort_symbols=True):
+        self.lang_list = list(lang_list) if lang_list else None
+        self.add_prefix_language = add_prefix_language
+        self.symbols, self.num_symbols = get_symbol(lang_list=self.lang_list, sort_symbols=sort_symbols, add_prefix_language=add_prefix_language)
+        self.symbol_to_id = symbol_to_id(self.symbols)
+        self.tone_start, self.num_tones = get_tone_id(self.lang_list)
+        self.language_id, self.num_languages = get_language_id(self.lang_list)
+        self._no_prefix = frozenset(punctuation + ["SP", "UNK", pad])
+
+    def encode(self, cleaned_text, tones, language, skip_no_symbol_when_infernce=True):
+        if self.add_prefix_language:
+            cleaned_text = [s if s in self._no_prefix else f"{language}_{s}" for s in cleaned_text]
+
+        symbol_to_id_map = self.symbol_to_id
+        if skip_no_symbol_when_infernce:
+            phones = [symbol_to_id_map.get(s, 0) for s in cleaned_text]
+        else:
+            phones = [symbol_to_id_map[symbol] for symbol in cleaned_text]
+
+        tone_start = self.tone_start[language]
+        tones = [i + tone_start for i in tones]
+
+        lang_id = self.language_id[language]
+        lang_ids = [lang_id] * len(phones)
+        return phones, tones, lang_ids
+
+
+@lru_cache(maxsize=None)
+def _get_encoder(lang_list, add_prefix_language, sort_symbols):
+    return SymbolEncoder(lang_list, add_prefix_language=add_prefix_language, sort_symbols=sort_symbols)
+
+def get_encoder(lang_list=None, add_prefix_language=False, sort_symbols=True):
+    """Shared `SymbolEncoder` for this key (None and [] both mean every language in LANG)."""
+    return _get_encoder(tuple(lang_list) if lang_list else None, add_prefix_language, sort_symbols)
+
+
+def cleaned_text_to_sequence(cleaned_text, tones, language, lang_list=None, add_prefix_language=False, skip_no_symbol_when_infernce=True, sort_symbols=True):
     """Converts a string of text to a sequence of IDs corresponding to the symbols in the text.
     Args:
       text: string to convert to a sequence
     Returns:
       List of integers corresponding to the symbols in the text
     """
-    if add_prefix_language:
-        cleaned_text= get_prefix_cleaned_text(cleaned_text, language)
-        #cleaned_text = [f"{language}_{s}" for s in cleaned_text]
-        #print(f"cleaned text: {cleaned_text}")
-
-    symbols, _ = get_symbol(lang_list=lang_list, add_prefix_language=add_prefix_language)
-    #print(f"symbols:\n{symbols}")
-    symbol_to_id_map = symbol_to_id(symbols)
-    if skip_no_symbol_when_infernce:
-        #print("replace wrong symbol with 0")
-        phones = [symbol_to_id_map.get(s, 0) for s in cleaned_text]
-
-    else:
-        phones = [symbol_to_id_map[symbol] for symbol in cleaned_text]
-    
-    tone_map, total_tones = get_tone_id(lang_list)
-    tone_start = tone_map[language]
-    #print(f"middle tones : {tones}")
-    tones = [i + tone_start for i in tones]
-
-    lang_id_map, _ = get_language_id(lang_list)
-    lang_id = lang_id_map[language]
-    lang_ids = [lang_id for i in phones]
-    #print(f"phones  :{phones}")
-    #print(f"tones   :{tones}")
-    #print(f"lang_ids:{lang_ids}")
-    return phones, tones, lang_ids
+    encoder = get_encoder(lang_list, add_prefix_language=add_prefix_language, sort_symbols=sort_symbols)
+    return encoder.encode(cleaned_text, tones, language, skip_no_symbol_when_infernce=skip_no_symbol_when_infernce)
 
 
 if __name__ == "__main__":
@@ -352,6 +352,10 @@ def extract_tones(phs):
     return phonemes, tones
 
 
+# word_tokenize needs the whole sentence, so only whole sentences are cached, see `G2PCache`
+G2P_CACHE_GRANULARITY = "sentence"
+
+
 def g2p(norm_text, pad_start_end=True):
     """
     Thai G2P simplified version.
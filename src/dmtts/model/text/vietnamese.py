@@ -49,6 +49,10 @@ def print_procedure(out_phones,out_tones):
     print(f"len_tones   :{len(out_tones)}")
     print("-----------------------------------------")        
 
+# vi2IPA_split converts the whole sentence, so only whole sentences are cached, see `G2PCache`
+G2P_CACHE_GRANULARITY = "sentence"
+
+
 def g2p(norm_text: str, add_space=False) -> Tuple[List[str], List[int]]:
 
     viet_ipa_split = vi2IPA_split(norm_text, delimit="/")
@@ -0,0 +1,80 @@
+# Export an inference-only generator checkpoint.
+#
+#   python -m dmtts.train.export_checkpoint --checkpoint logs/KR/G_100000.pth --output ckpts/KR/model.safetensors
+#   python -m dmtts.train.export_checkpoint -c checkpoint.pth -o model.safetensors --dtype fp16
+#
+# The training checkpoint holds the full generator, the optimizer state, iteration and
+# learning rate. The export keeps only the generator weights used by `SynthesizerTrn.infer`
+# (the posterior encoder `enc_q` is training-only) and writes them as safetensors, which
+# `TTS` memory-maps instead of unpickling. Put it next to config.json (as model.safetensors)
+# or pass it as `TTS(..., ckpt_path=...)`.
+import os
+import shutil
+
+import click
+import torch
+from safetensors.torch import save_file
+
+DTYPES = {
+    "fp32": torch.float32,
+    "fp16": torch.float16,
+    "bf16": torch.bfloat16,
+}
+
+# parameters that `infer` never touches
+TRAINING_ONLY_PREFIXES = ("enc_q.",)
+# discriminator state if a combined G/D/DUR dict is passed in
+DISCRIMINATOR_PREFIXES = ("net_d.", "net_dur_disc.", "disc.", "dur_disc.")
+
+
+def inference_state_dict(checkpoint_dict, dtype=None):
+    state_dict = checkpoint_dict["model"] if "model" in checkpoint_dict else checkpoint_dict
+    out = {}
+    for k, v in state_dict.items():
+        if k.startswith("module."):  # saved from a DDP wrapper
+            k = k[len("module."):]
+        if k.startswith(TRAINING_ONLY_PREFIXES + DISCRIMINATOR_PREFIXES):
+            continue
+        if dtype is not None and v.is_floating_point():
+            v = v.to(dtype)
+        # safetensors refuses shared / non-contiguous storage
+        out[k] = v.detach().contiguous().clone()
+    return out
+
+
+def export_checkpoint(checkpoint_path, output_path, dtype=None):
+    checkpoint_dict = torch.load(checkpoint_path, map_location="cpu")
+    state_dict = inference_state_dict(checkpoint_dict, DTYPES[dtype] if dtype else None)
+    metadata = {
+        "format": "dmtts-inference",
+        "dtype": dtype or "fp32",
+        "iteration": str(checkpoint_dict.get("iteration", "")),
+        "source": os.path.basename(checkpoint_path),
+    }
+    save_file(state_dict, output_path, metadata=metadata)
+    return state_dict
+
+
+@click.command()
+@click.option("--checkpoint", "-c", required=True, type=click.Path(exists=True, dir_okay=False), help="Training generator checkpoint (G_*.pth / checkpoint.pth)")
+@click.option("--output", "-o", required=True, help="Output .safetensors path")
+@click.option("--dtype", type=click.Choice(list(DTYPES)), default="fp32", show_default=True, help="Storage precision of the exported weights")
+@click.option("--config", default=None, type=click.Path(exists=True, dir_okay=False), help="config.json to copy next to the output")
+def main(checkpoint, output, dtype, config):
+    if not output.endswith(".safetensors"):
+        raise click.BadParameter("output must end with .safetensors", param_hint="--output")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    state_dict = export_checkpoint(checkpoint, output, dtype)
+    n_params = sum(v.numel() for v in state_dict.values())
+    print(f"Exported {len(state_dict)} tensors ({n_params / 1e6:.1f}M params, {dtype}) -> {output}")
+    print(f"{os.path.getsize(checkpoint) / 2**20:.1f} MiB -> {os.path.getsize(output) / 2**20:.1f} MiB")
+
+    if config is not None:
+        config_out = os.path.join(os.path.dirname(os.path.abspath(output)), "config.json")
+        if os.path.abspath(config) != config_out:
+            shutil.copyfile(config, config_out)
+
+
+if __name__ == "__main__":
+    main()
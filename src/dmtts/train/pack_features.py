@@ -0,0 +1,118 @@
+# Pack a filelist into memory-mapped training shards.
+#
+#   python -m dmtts.train.pack_features -c data/V2/KR/config.json -f data/V2/KR/train.list -o data/V2/KR/train_shards
+#   python -m dmtts.train.pack_features -c config.json -f val.list -o val_shards --shard-size-mb 256 -j 16
+#
+# Every item goes through `TextAudioSpeakerLoader` (same filtering, text encoding and
+# spectrogram as training from the filelist) and is appended to the current shard; see
+# `ShardedFeatureDataset` for the layout. Train from the shards by setting
+# "training_shards" (and optionally "validation_shards") in the data section of the config.
+import os
+import json
+
+import click
+import numpy as np
+import torch
+from tqdm import tqdm
+
+from dmtts.utils.data_utils import TextAudioSpeakerLoader, SHARD_INDEX_COLUMNS, shard_meta
+from dmtts.utils.hparam_utils import get_hparams_from_file
+
+
+SHARD_FILES = (".spec.f16", ".wav.i16", ".text.i16", ".index.npy")
+
+
+class ShardWriter:
+    def __init__(self, out_dir, shard_size):
+        self.out_dir = out_dir
+        self.shard_size = shard_size
+        self.shards = []
+        self.files = None
+
+    def _next_shard(self):
+        self.close()
+        name = f"shard_{len(self.shards):05d}"
+        self.shards.append({"name": name, "num_items": 0})
+        self.files = {ext: open(os.path.join(self.out_dir, name + ext), "wb") for ext in SHARD_FILES[:-1]}
+        self.offsets = {ext: 0 for ext in self.files}
+        self.nbytes = 0
+        self.rows = []
+
+    def _write(self, ext, array):
+        offset = self.offsets[ext]
+        self.files[ext].write(array.tobytes())
+        self.offsets[ext] += array.size
+        self.nbytes += array.nbytes
+        return offset
+
+    def add(self, phones, spec, wav, sid, tone, language):
+        if self.files is None or self.nbytes >= self.shard_size:
+            self._next_shard()
+        spec = spec.numpy().astype(np.float16)
+        wav = np.clip(np.round(wav.numpy().reshape(-1) * 32768.0), -32768, 32767).astype(np.int16)
+        text = np.stack([phones.numpy(), tone.numpy(), language.numpy()]).astype(np.int16)
+        row = (
+            self._write(".spec.f16", spec), spec.shape[1],
+            self._write(".wav.i16", wav), wav.shape[0],
+            self._write(".text.i16", text), text.shape[1],
+            int(sid[0]),
+        )
+        self.rows.append(row)
+        self.shards[-1]["num_items"] += 1
+
+    def close(self):
+        if self.files is None:
+            return
+        for f in self.files.values():
+            f.close()
+        index = np.asarray(self.rows, dtype=np.int64).reshape(-1, len(SHARD_INDEX_COLUMNS))
+        np.save(os.path.join(self.out_dir, self.shards[-1]["name"] + ".index.npy"), index)
+        self.files = None
+
+    def paths(self):
+        return [os.path.join(self.out_dir, shard["name"] + ext) for shard in self.shards for ext in SHARD_FILES]
+
+
+@click.command()
+@click.option("--config", "-c", required=True, type=click.Path(exists=True, dir_okay=False), help="Training config.json")
+@click.option("--filelist", "-f", required=True, type=click.Path(exists=True, dir_okay=False), help="Cleaned filelist (train.list / val.list)")
+@click.option("--output", "-o", required=True, help="Output directory for the shards")
+@click.option("--shard-size-mb", type=int, default=1024, show_default=True, help="Approximate size of one shard")
+@click.option("--num-workers", "-j", type=int, default=os.cpu_count(), show_default=True)
+def main(config, filelist, output, shard_size_mb, num_workers):
+    hps = get_hparams_from_file(config)
+    os.makedirs(output, exist_ok=True)
+    meta_path = os.path.join(output, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)  # an interrupted re-pack must not look complete
+    for name in os.listdir(output):
+        if name.startswith("shard_") and name.endswith(SHARD_FILES):
+            os.remove(os.path.join(output, name))  # left over from an earlier, larger pack
+
+    dataset = TextAudioSpeakerLoader(filelist, hps.data)
+    # the DataLoader workers load, resample and compute spectrograms in parallel; items arrive in order
+    loader = torch.utils.data.DataLoader(dataset, batch_size=None, shuffle=False, num_workers=num_workers)
+
+    writer = ShardWriter(output, shard_size_mb * 2**20)
+    n_channels = None
+    for phones, spec, wav, sid, tone, language in tqdm(loader, total=len(dataset)):
+        n_channels = spec.size(0)
+        writer.add(phones, spec, wav, sid, tone, language)
+    writer.close()
+
+    meta = dict(
+        shard_meta(hps.data, dataset.spec_cache.params),
+        n_channels=n_channels,
+        num_items=len(dataset),
+        source=os.path.abspath(filelist),
+        shards=writer.shards,
+    )
+    # written last: its presence marks a complete shard set
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    total = sum(os.path.getsize(path) for path in writer.paths())
+    print(f"Packed {len(dataset)} items into {len(writer.shards)} shard(s), {total / 2**20:.1f} MiB -> {output}")
+
+
+if __name__ == "__main__":
+    main()
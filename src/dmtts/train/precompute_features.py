@@ -0,0 +1,72 @@
+# Fill the spectrogram cache of a training set before training starts.
+#
+#   python -m dmtts.train.precompute_features -c data/V2/KR/config.json -j 16
+#   python -m dmtts.train.precompute_features -c config.json -f data/V2/KR/train.list --force
+#
+# Computes the linear (or mel, with use_mel_posterior_encoder) spectrogram of every wav
+# in the filelists with the config's STFT parameters and stores it where
+# `TextAudioSpeakerLoader` looks for it (see `SpectrogramCache`). Entries that are
+# already valid for the current parameters and wav are skipped.
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+import torch
+from tqdm import tqdm
+
+from dmtts.utils.data_utils import SpectrogramCache
+from dmtts.utils.hparam_utils import get_hparams_from_file, load_filepaths_and_text
+from dmtts.utils.hparam_utils import load_wav_to_torch_librosa as load_wav_to_torch
+
+_cache = None
+_force = False
+
+
+def _init_worker(data_hparams, force):
+    global _cache, _force
+    # one STFT per process, the pool provides the parallelism
+    torch.set_num_threads(1)
+    _cache = SpectrogramCache(data_hparams)
+    _force = force
+
+
+def _process(filename):
+    try:
+        if not _force and _cache.load(filename) is not None:
+            return "cached", filename
+        audio_norm, sampling_rate = load_wav_to_torch(filename, _cache.hparams.sampling_rate)
+        spec = _cache.compute(audio_norm.unsqueeze(0))
+        _cache.save(filename, spec)
+        return "computed", filename
+    except Exception as e:
+        return f"failed: {e}", filename
+
+
+@click.command()
+@click.option("--config", "-c", required=True, type=click.Path(exists=True, dir_okay=False), help="Training config.json")
+@click.option("--filelist", "-f", multiple=True, help="Filelist(s) to process, repeatable (default: training and validation files of the config)")
+@click.option("--num-workers", "-j", type=int, default=os.cpu_count(), show_default=True)
+@click.option("--force", is_flag=True, help="Recompute entries that are still valid")
+def main(config, filelist, num_workers, force):
+    hps = get_hparams_from_file(config)
+    if not filelist:
+        filelist = [hps.data.training_files, hps.data.validation_files]
+
+    # TextAudioSpeakerLoader filelists: path|spk|language|text|phones|tones
+    filenames = sorted({line[0] for fl in filelist for line in load_filepaths_and_text(fl)})
+    print(f"{len(filenames)} wavs from {len(filelist)} filelist(s), {num_workers} workers")
+
+    counts = {"cached": 0, "computed": 0, "failed": 0}
+    with ProcessPoolExecutor(num_workers, initializer=_init_worker, initargs=(hps.data, force)) as executor:
+        results = executor.map(_process, filenames, chunksize=16)
+        for status, filename in tqdm(results, total=len(filenames)):
+            if status.startswith("failed"):
+                counts["failed"] += 1
+                print(f"{filename}: {status}")
+            else:
+                counts[status] += 1
+    print(", ".join(f"{k}: {v}" for k, v in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
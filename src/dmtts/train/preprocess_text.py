@@ -11,10 +11,129 @@ import os
 import torch
 #from text.symbols import symbols, num_languages, num_tones
 from dmtts.model.text.symbols import get_symbol, get_language_id, get_tone_id
-from dmtts.model.text.cleaner import clean_text
+from dmtts.model.text.cleaner import clean_text, get_language_module
+from multiprocessing import Pool
 
 ### config 생성시에 lang_list 넣는거 필요함
 
+# per worker process: known symbols per language, unknown symbols already reported
+_known_symbols = {}
+_reported_symbols = set()
+
+
+def _init_worker(language_list):
+    # forked workers inherit the parent's state
+    _reported_symbols.clear()
+    _load_languages(language_list)
+
+
+def _load_languages(language_list):
+    # load every frontend and symbol table once per process instead of per line / phone
+    for language in language_list:
+        try:
+            get_language_module(language)
+            symbols, _ = get_symbol([str(language)], add_prefix_language=False)
+        except Exception:
+            continue  # unsupported language: its lines fail in clean_text and are reported there
+        _known_symbols[language] = set(symbols)
+
+
+def _clean_line(line):
+    """-> (cleaned line or None, error or None, [(language, unknown symbol), ...])"""
+    try:
+        utt, spk, language, text = line.strip().split("|")
+        norm_text, phones, tones = clean_text(text, language)
+        assert len(phones) == len(tones)
+    except Exception as error:
+        return None, error, []
+
+    unknown = []
+    if language not in _known_symbols:
+        _load_languages([language])
+    known = _known_symbols.get(language, set())
+    for ph in phones:
+        if ph not in known and (language, ph) not in _reported_symbols:
+            _reported_symbols.add((language, ph))
+            unknown.append((language, ph))
+
+    cleaned = "{}|{}|{}|{}|{}|{}\n".format(
+        utt,
+        spk,
+        language,
+        norm_text,
+        " ".join(phones),
+        " ".join([str(i) for i in tones]),
+    )
+    return cleaned, None, unknown
+
+
+def clean_metadata(lines, metadata, cleaned_path, language_list, num_workers=1, resume=True, checkpoint_every=1000):
+    """
+    Cleans `lines` into `cleaned_path`, in input order, with `num_workers`
+    processes. Progress is checkpointed to `cleaned_path + ".progress"` every
+    `checkpoint_every` lines, so a rerun on the same metadata continues where
+    an interrupted one stopped. Returns {language: [unknown symbols]}.
+    """
+    progress_path = cleaned_path + ".progress"
+    st = os.stat(metadata)
+    source = {"metadata": os.path.abspath(metadata), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    done, offset, new_symbols = 0, 0, {}
+    if resume and os.path.exists(progress_path) and os.path.exists(cleaned_path):
+        with open(progress_path, encoding="utf-8") as f:
+            progress = json.load(f)
+        if progress["source"] == source:
+            done, offset, new_symbols = progress["done"], progress["offset"], progress["new_symbols"]
+            print(f"resuming after {done} / {len(lines)} lines")
+
+    def checkpoint():
+        out_file.flush()
+        os.fsync(out_file.fileno())
+        tmp_path = progress_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"source": source, "done": done, "offset": out_file.tell(), "new_symbols": new_symbols}, f, ensure_ascii=False)
+        os.replace(tmp_path, progress_path)
+
+    # drop whatever was written after the last checkpoint
+    out_file = open(cleaned_path, "r+b" if done else "wb")
+    out_file.truncate(offset)
+    out_file.seek(offset)
+
+    todo = lines[done:]
+    if num_workers > 1:
+        pool = Pool(num_workers, initializer=_init_worker, initargs=(language_list,))
+        results = pool.imap(_clean_line, todo, chunksize=64)
+    else:
+        pool = None
+        _init_worker(language_list)
+        results = map(_clean_line, todo)
+
+    try:
+        for line, (cleaned, error, unknown) in tqdm(zip(todo, results), total=len(todo)):
+            if error is not None:
+                print("err!", line, error)
+            else:
+                out_file.write(cleaned.encode("utf-8"))
+            for language, ph in unknown:
+                # workers report each symbol once; merge across workers
+                if ph not in new_symbols.setdefault(language, []):
+                    new_symbols[language].append(ph)
+                    print(f'update!, new symbol for {language}: {ph}')
+            done += 1
+            if done % checkpoint_every == 0:
+                checkpoint()
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if done < len(lines):
+            checkpoint()
+        out_file.close()
+
+    if os.path.exists(progress_path):
+        os.remove(progress_path)
+    return new_symbols
+
+
 @click.command()
 @click.option(
     "--metadata",
@@ -34,6 +153,9 @@ from dmtts.model.text.cleaner import clean_text
 @click.option("--val-per-spk", default=10)
 @click.option("--max-val-total", default=10)
 @click.option("--clean/--no-clean", default=True)
+@click.option("--num-workers", "-j", default=1, help="Processes for clean_text")
+@click.option("--resume/--no-resume", default=True, help="Continue an interrupted cleaning run")
+@click.option("--checkpoint-every", default=1000, help="Lines between progress checkpoints")
 def main(
     metadata: str,
     cleaned_path: Optional[str],
@@ -45,6 +167,9 @@ def main(
     clean: bool,
     train_language: str,
     version_of_model: int,
+    num_workers: int,
+    resume: bool,
+    checkpoint_every: int,
 ):
     
     HERE = Path(__file__).resolve()
@@ -67,60 +192,22 @@ def main(
 
     #exit()
     if clean:
-        out_file = open(cleaned_path, "w", encoding="utf-8")
-        new_symbols = []
+        with open(metadata, encoding="utf-8") as f:
+            lines = f.readlines()
+        # languages in order of first appearance, also for lines that fail to clean
         language_list = []
-        language_seen = set()
-        #exit()
-        for line in tqdm(open(metadata, encoding="utf-8").readlines()):
-            try:
-                utt, spk, language, text = line.strip().split("|")
-                
-
-
-                if language not in language_seen:
-                    language_seen.add(language)
-                    language_list.append(language)
-                #norm_text, phones, tones, word2ph, bert = clean_text_bert(text, language, device='cuda:0')
-
-                norm_text, phones, tones = clean_text(text, language)
-                #exit()
-                
-                for ph in phones:
-                    #exit()
-                    symbols, _ = get_symbol([str(language)],add_prefix_language=False)
-                    #print(f"symobls of {language}: {symbols}")
-                    #print(f"ph: {ph}")
-                    #print(f"new_symbols: {new_symbols}")
-                    #exit()
-                    if ph not in symbols and ph not in new_symbols:
-                        new_symbols.append(ph)
-                        print('update!, now symbols:')
-                        print(new_symbols)
-                        
-                        with open(f'{language}_symbol.txt', 'w') as f:
-                            f.write(f'{new_symbols}')
-
-                assert len(phones) == len(tones)
-                #assert len(phones) == sum(word2ph)
-                out_file.write(
-                    "{}|{}|{}|{}|{}|{}\n".format(
-                        utt,
-                        spk,
-                        language,
-                        norm_text,
-                        " ".join(phones),
-                        " ".join([str(i) for i in tones]),
-                        #" ".join([str(i) for i in word2ph]),
-                    )
-                )
-                #bert_path = utt.replace(".wav", ".bert.pt")
-                #os.makedirs(os.path.dirname(bert_path), exist_ok=True)
-                #torch.save(bert.cpu(), bert_path)
-            except Exception as error:
-                print("err!", line, error)
+        for line in lines:
+            parts = line.strip().split("|")
+            if len(parts) == 4 and parts[2] not in language_list:
+                language_list.append(parts[2])
 
-        out_file.close()
+        new_symbols = clean_metadata(
+            lines, metadata, cleaned_path, language_list, num_workers, resume, checkpoint_every
+        )
+        for language, symbols in new_symbols.items():
+            print(f"unknown symbols for {language}: {symbols}")
+            with open(f'{language}_symbol.txt', 'w') as f:
+                f.write(f'{symbols}')
 
         metadata = cleaned_path
 
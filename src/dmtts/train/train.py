@@ -18,6 +18,7 @@ from dmtts.model import commons
 import dmtts.utils.hparam_utils as utils  # 원래 그냥 utils.py
 from dmtts.utils.data_utils import (
     TextAudioSpeakerLoader,
+    ShardedFeatureDataset,
     TextAudioSpeakerCollate,
     DistributedBucketSampler,
 )
@@ -111,7 +112,10 @@ def run():
         utils.check_git_hash(hps.model_dir)
         writer = SummaryWriter(log_dir=hps.model_dir)
         writer_eval = SummaryWriter(log_dir=os.path.join(hps.model_dir, "eval"))
-    train_dataset = TextAudioSpeakerLoader(hps.data.training_files, hps.data)
+    if getattr(hps.data, "training_shards", None):
+        train_dataset = ShardedFeatureDataset(hps.data.training_shards, hps.data)
+    else:
+        train_dataset = TextAudioSpeakerLoader(hps.data.training_files, hps.data)
     train_sampler = DistributedBucketSampler(
         train_dataset,
         hps.train.batch_size,
@@ -132,7 +136,10 @@ def run():
         prefetch_factor=4,
     )  # DataLoader config could be adjusted.
     if rank == 0:
-        eval_dataset = TextAudioSpeakerLoader(hps.data.validation_files, hps.data)
+        if getattr(hps.data, "validation_shards", None):
+            eval_dataset = ShardedFeatureDataset(hps.data.validation_shards, hps.data)
+        else:
+            eval_dataset = TextAudioSpeakerLoader(hps.data.validation_files, hps.data)
         eval_loader = DataLoader(
             eval_dataset,
             num_workers=0,
@@ -491,7 +498,7 @@ def train_and_evaluate(
             #print("#################### 5 ####################")
 
             y = commons.slice_segments(
-                y, ids_slice * hps.data.hop_length, hps.train.segment_size
+                y, ids_slice, hps.train.segment_size, hop_length=hps.data.hop_length
             )  # slice
             #print("#################### 6 ####################")
 
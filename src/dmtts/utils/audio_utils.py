@@ -0,0 +1,90 @@
+import io
+import struct
+import numpy as np
+import soundfile
+
+# RIFF sizes are unknown while streaming; 0xFFFFFFFF is the usual "open ended" marker
+_UNKNOWN_SIZE = 0xFFFFFFFF
+
+_SUBTYPES = {
+    # subtype: (wave format tag, bits per sample)
+    "PCM_16": (1, 16),
+    "FLOAT": (3, 32),
+}
+
+
+class WavStreamWriter:
+    """
+    Incremental WAV writer for mono float32 chunks (e.g. from `TTS.tts_stream`).
+
+    `f` may be a path or any binary file-like object with `write` (socket.makefile,
+    sys.stdout.buffer, BytesIO, ...). The header is written up front with open-ended
+    sizes; if the target is seekable they are patched with the real sizes on close().
+    """
+
+    def __init__(self, f, sampling_rate, subtype="PCM_16"):
+        if subtype not in _SUBTYPES:
+            raise ValueError(f"Unsupported subtype: {subtype} (choose from {list(_SUBTYPES)})")
+        self.sampling_rate = sampling_rate
+        self.subtype = subtype
+        self.format_tag, self.bits = _SUBTYPES[subtype]
+        self._own = isinstance(f, str)
+        self.f = open(f, "wb") if self._own else f
+        self.num_samples = 0
+        self._write_header(_UNKNOWN_SIZE, _UNKNOWN_SIZE)
+
+    def _write_header(self, riff_size, data_size):
+        block_align = self.bits // 8
+        self.f.write(b"RIFF")
+        self.f.write(struct.pack("<I", riff_size))
+        self.f.write(b"WAVE")
+        self.f.write(b"fmt ")
+        self.f.write(struct.pack(
+            "<IHHIIHH",
+            16,
+            self.format_tag,
+            1, # channels
+            self.sampling_rate,
+            self.sampling_rate * block_align,
+            block_align,
+            self.bits,
+        ))
+        self.f.write(b"data")
+        self.f.write(struct.pack("<I", data_size))
+
+    def write(self, chunk):
+        chunk = np.asarray(chunk, dtype=np.float32).reshape(-1)
+        if self.subtype == "PCM_16":
+            # converted by libsndfile, so the samples are exactly those `soundfile.write`
+            # produces for the whole signal (its float -> int16 rule varies by version)
+            buf = io.BytesIO()
+            soundfile.write(buf, chunk, self.sampling_rate, subtype="PCM_16", format="RAW", endian="LITTLE")
+            data = buf.getvalue()
+        else:
+            data = chunk.astype("<f4").tobytes()
+        self.f.write(data)
+        if hasattr(self.f, "flush"):
+            self.f.flush()
+        self.num_samples += chunk.shape[0]
+
+    def close(self):
+        if self.f is None:
+            return
+        data_size = self.num_samples * (self.bits // 8)
+        seekable = getattr(self.f, "seekable", lambda: False)()
+        if seekable and data_size + 36 < _UNKNOWN_SIZE:
+            end = self.f.tell()
+            self.f.seek(end - 44 - data_size)
+            self._write_header(36 + data_size, data_size)
+            self.f.seek(end)
+        if self._own:
+            self.f.close()
+        elif hasattr(self.f, "flush"):
+            self.f.flush()
+        self.f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,5 +1,7 @@
 import os
+import json
 import random
+import tempfile
 import torch
 import torch.utils.data
 from tqdm import tqdm
@@ -9,12 +11,212 @@ from dmtts.train.mel_processing import spectrogram_torch, mel_spectrogram_torch
 from dmtts.utils.hparam_utils import load_filepaths_and_text
 from dmtts.utils.hparam_utils import load_wav_to_torch_librosa as load_wav_to_torch
 # from dmtts.utils.hparam_utils import load_wav_to_torch
-from dmtts.model.text.symbols import cleaned_text_to_sequence
+from dmtts.model.text.symbols import get_encoder
 import numpy as np
+import soundfile
 import torchaudio
+from concurrent.futures import ThreadPoolExecutor
 """Multi speaker version"""
 
 
+class SpectrogramCache:
+    """
+    Linear / mel spectrograms of the training wavs, stored next to each wav
+    (`x.spec.pt`, or `x.mel.pt` with `use_mel_posterior_encoder`).
+
+    An entry records the STFT parameters and the wav's size and mtime, and is
+    only used if all of them still match, so changing the config or replacing
+    a wav recomputes it. Entries are written to a temp file and renamed into
+    place, so concurrent DataLoader workers never read a partial file.
+    """
+
+    VERSION = 1
+
+    def __init__(self, hparams, enabled=None):
+        self.hparams = hparams
+        self.use_mel = getattr(hparams, "use_mel_posterior_encoder", False)
+        self.enabled = getattr(hparams, "cache_spec", True) if enabled is None else enabled
+        self.params = {
+            "version": self.VERSION,
+            "kind": "mel" if self.use_mel else "linear",
+            "sampling_rate": hparams.sampling_rate,
+            "filter_length": hparams.filter_length,
+            "hop_length": hparams.hop_length,
+            "win_length": hparams.win_length,
+            "center": False,
+        }
+        if self.use_mel:
+            self.params.update(
+                n_mel_channels=getattr(hparams, "n_mel_channels", 80),
+                mel_fmin=hparams.mel_fmin,
+                mel_fmax=hparams.mel_fmax,
+            )
+        self.n_channels = self.params["n_mel_channels"] if self.use_mel else hparams.filter_length // 2 + 1
+        self._write_failed = False
+
+    def path(self, filename):
+        stem = filename[:-len(".wav")] if filename.endswith(".wav") else filename
+        return stem + (".mel.pt" if self.use_mel else ".spec.pt")
+
+    @staticmethod
+    def _source(filename):
+        st = os.stat(filename)
+        return st.st_size, st.st_mtime_ns
+
+    def compute(self, audio_norm):
+        """audio_norm: [1, T] -> spec [C, T // hop]"""
+        if self.use_mel:
+            spec = mel_spectrogram_torch(
+                audio_norm,
+                self.hparams.filter_length,
+                self.params["n_mel_channels"],
+                self.hparams.sampling_rate,
+                self.hparams.hop_length,
+                self.hparams.win_length,
+                self.hparams.mel_fmin,
+                self.hparams.mel_fmax,
+                center=False,
+            )
+        else:
+            spec = spectrogram_torch(
+                audio_norm,
+                self.hparams.filter_length,
+                self.hparams.sampling_rate,
+                self.hparams.hop_length,
+                self.hparams.win_length,
+                center=False,
+            )
+        return torch.squeeze(spec, 0)
+
+    def load(self, filename):
+        """The cached spec of `filename`, or None if missing or stale."""
+        if not self.enabled:
+            return None
+        try:
+            entry = torch.load(self.path(filename), map_location="cpu")
+            size, mtime_ns = self._source(filename)
+        except Exception:
+            return None
+        if not isinstance(entry, dict) or entry.get("params") != self.params:
+            return None
+        if entry.get("source_size") != size or entry.get("source_mtime_ns") != mtime_ns:
+            return None
+        spec = entry.get("spec")
+        if not isinstance(spec, torch.Tensor) or spec.dim() != 2 or spec.size(0) != self.n_channels:
+            return None
+        return spec
+
+    def save(self, filename, spec):
+        if not self.enabled:
+            return
+        size, mtime_ns = self._source(filename)
+        entry = {"params": self.params, "source_size": size, "source_mtime_ns": mtime_ns, "spec": spec.contiguous()}
+        path = self.path(filename)
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path) or ".")
+            with os.fdopen(fd, "wb") as f:
+                torch.save(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            if not self._write_failed:  # e.g. read-only dataset, warn once per worker
+                logger.warning(f"spectrogram cache not writable ({e}), computing on the fly")
+                self._write_failed = True
+
+
+def resampled_length(n_samples, orig_sr, target_sr):
+    """Samples `librosa.load(..., sr=target_sr)` returns for a file of n_samples at orig_sr."""
+    if orig_sr == target_sr:
+        return n_samples
+    return int(np.ceil(n_samples * (float(target_sr) / orig_sr)))
+
+
+def spec_frames(n_samples, filter_length, hop_length):
+    """Frames of `spectrogram_torch` / `mel_spectrogram_torch` (reflect padding, center=False)."""
+    pad = int((filter_length - hop_length) / 2)
+    return max((n_samples + 2 * pad - filter_length) // hop_length + 1, 0)
+
+
+class AudioLengthIndex:
+    """
+    Exact post-resampling sample counts of the wavs of a filelist, persisted
+    next to it (`train.list.lengths.json`) so that bucketing does not need to
+    estimate lengths from file sizes or decode every file at startup.
+
+    Lengths come from the audio headers (`soundfile.info`), read in parallel;
+    only files that cannot be parsed that way are decoded. Entries remember
+    the file's size and mtime and are refreshed when either changes.
+    """
+
+    VERSION = 1
+
+    def __init__(self, filelist, sampling_rate, num_workers=16):
+        self.path = f"{filelist}.lengths.json"
+        self.sampling_rate = sampling_rate
+        self.num_workers = num_workers
+        self.entries = {}  # path -> [size, mtime_ns, samples]
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION and data.get("sampling_rate") == sampling_rate:
+                self.entries = data["entries"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _probe(self, filename):
+        st = os.stat(filename)
+        try:
+            info = soundfile.info(filename)
+            samples = resampled_length(info.frames, info.samplerate, self.sampling_rate)
+        except Exception:
+            # no header soundfile can read (e.g. some compressed formats): decode it
+            samples = load_wav_to_torch(filename, self.sampling_rate)[0].numel()
+        return [st.st_size, st.st_mtime_ns, samples]
+
+    def _is_fresh(self, filename):
+        entry = self.entries.get(filename)
+        if entry is None:
+            return False
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return False
+        return entry[0] == st.st_size and entry[1] == st.st_mtime_ns
+
+    def update(self, filenames):
+        """Probes missing / stale files; returns {path: samples or None if unreadable}."""
+        stale = [f for f in dict.fromkeys(filenames) if not self._is_fresh(f)]
+        failed = set()
+        if stale:
+            logger.info(f"length index: reading {len(stale)} audio header(s)")
+            with ThreadPoolExecutor(self.num_workers) as executor:
+                futures = {f: executor.submit(self._probe, f) for f in stale}
+                for filename, future in futures.items():
+                    try:
+                        self.entries[filename] = future.result()
+                    except Exception as e:
+                        logger.warning(f"[SKIP AUDIO] {filename} length error: {e}")
+                        self.entries.pop(filename, None)
+                        failed.add(filename)
+            self.save()
+        return {f: (None if f in failed else self.entries[f][2]) for f in filenames}
+
+    def save(self):
+        data = {"version": self.VERSION, "sampling_rate": self.sampling_rate, "entries": self.entries}
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + ".", suffix=".tmp", dir=os.path.dirname(self.path) or ".")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            logger.warning(f"length index not writable ({e}), it will be rebuilt next time")
+
+
 class TextAudioSpeakerLoader(torch.utils.data.Dataset):
     """
     1) loads audio, speaker_id, text pairs
@@ -23,6 +225,7 @@ class TextAudioSpeakerLoader(torch.utils.data.Dataset):
     """
 
     def __init__(self, audiopaths_sid_text, hparams):
+        self.filelist = audiopaths_sid_text
         self.audiopaths_sid_text = load_filepaths_and_text(audiopaths_sid_text)
         self.max_wav_value = hparams.max_wav_value
         self.sampling_rate = hparams.sampling_rate
@@ -33,6 +236,7 @@ class TextAudioSpeakerLoader(torch.utils.data.Dataset):
         self.spk_map = hparams.spk2id
         self.hparams = hparams
         self.lang_list = hparams.lang_list #################################
+        self.text_encoder = get_encoder(self.lang_list)
         #self.disable_bert = getattr(hparams, "disable_bert", False)
 
         self.use_mel_spec_posterior = getattr(
@@ -41,11 +245,14 @@ class TextAudioSpeakerLoader(torch.utils.data.Dataset):
         if self.use_mel_spec_posterior:
             self.n_mel_channels = getattr(hparams, "n_mel_channels", 80)
 
+        self.spec_cache = SpectrogramCache(hparams)
+
         self.cleaned_text = getattr(hparams, "cleaned_text", False)
 
         self.add_blank = hparams.add_blank
         self.min_text_len = getattr(hparams, "min_text_len", 1)
         self.max_text_len = getattr(hparams, "max_text_len", 300)
+        self.use_length_index = getattr(hparams, "use_length_index", True)
 
         random.seed(1234)
         random.shuffle(self.audiopaths_sid_text)
@@ -120,6 +327,8 @@ class TextAudioSpeakerLoader(torch.utils.data.Dataset):
         Filter text & store spec lengths
         """
         # Store spectrogram lengths for Bucketing
+        # use_length_index (default): exact, from the filelist's AudioLengthIndex
+        # otherwise estimated from the file size:
         # wav_length ~= file_size / (wav_channels * Bytes per dim) = file_size / (1 * 2)
         # spec_length = wav_length // hop_length
 
@@ -127,6 +336,11 @@ class TextAudioSpeakerLoader(torch.utils.data.Dataset):
         lengths = []
         skipped = 0
         logger.info("Init dataset...")
+        samples = None
+        if self.use_length_index:
+            samples = AudioLengthIndex(self.filelist, self.sampling_rate).update(
+                [f"{item[0]}" for item in self.audiopaths_sid_text if len(item) == 6]
+            )
         for item in tqdm(
             self.audiopaths_sid_text
         ):
@@ -137,12 +351,19 @@ class TextAudioSpeakerLoader(torch.utils.data.Dataset):
                 raise
             audiopath = f"{_id}"
             if self.min_text_len <= len(phones) and len(phones) <= self.max_text_len:
+                if samples is not None:
+                    if samples[audiopath] is None:
+                        skipped += 1
+                        continue
+                    length = spec_frames(samples[audiopath], self.filter_length, self.hop_length)
+                else:
+                    length = os.path.getsize(audiopath) // (2 * self.hop_length)
                 phones = phones.split(" ")
                 tone = [int(i) for i in tone.split(" ")]
                 audiopaths_sid_text_new.append(
                     [audiopath, spk, language, text, phones, tone]
                 )
-                lengths.append(os.path.getsize(audiopath) // (2 * self.hop_length))
+                lengths.append(length)
             else:
                 skipped += 1
         logger.info(f'min: {min(lengths)}; max: {max(lengths)}' )
@@ -185,41 +406,15 @@ class TextAudioSpeakerLoader(torch.utils.data.Dataset):
         # NOTE: normalize has been achieved by torchaudio
         # audio_norm = audio / self.max_wav_value
         audio_norm = audio_norm.unsqueeze(0)
-        spec_filename = filename.replace(".wav", ".spec.pt")
-        if self.use_mel_spec_posterior:
-            spec_filename = spec_filename.replace(".spec.pt", ".mel.pt")
-        try:
-            spec = torch.load(spec_filename)
-            assert False
-        except:
-            if self.use_mel_spec_posterior:
-                spec = mel_spectrogram_torch(
-                    audio_norm,
-                    self.filter_length,
-                    self.n_mel_channels,
-                    self.sampling_rate,
-                    self.hop_length,
-                    self.win_length,
-                    self.hparams.mel_fmin,
-                    self.hparams.mel_fmax,
-                    center=False,
-                )
-            else:
-                spec = spectrogram_torch(
-                    audio_norm,
-                    self.filter_length,
-                    self.sampling_rate,
-                    self.hop_length,
-                    self.win_length,
-                    center=False,
-                )
-            spec = torch.squeeze(spec, 0)
-            torch.save(spec, spec_filename)
+        spec = self.spec_cache.load(filename)
+        if spec is None:
+            spec = self.spec_cache.compute(audio_norm)
+            self.spec_cache.save(filename, spec)
         return spec, audio_norm
 
     def get_text(self, text, phone, tone, language_str, wav_path):
         #print(f"before clean_text_to_sequence:  {tone}")
-        phone, tone, language = cleaned_text_to_sequence(phone, tone, language_str, lang_list=self.lang_list) #########
+        phone, tone, language = self.text_encoder.encode(phone, tone, language_str) #########
         #print(f"tone:    {tone}")
         #exit()
         if self.add_blank:
@@ -242,6 +437,92 @@ class TextAudioSpeakerLoader(torch.utils.data.Dataset):
         return len(self.audiopaths_sid_text)
 
 
+SHARD_FORMAT_VERSION = 1
+# columns of a shard's index array
+SHARD_INDEX_COLUMNS = ("spec_offset", "frames", "wav_offset", "samples", "text_offset", "text_len", "sid")
+
+
+def shard_meta(hparams, spec_params):
+    """What a packed shard set depends on, besides the filelist."""
+    return {
+        "version": SHARD_FORMAT_VERSION,
+        "spec_params": spec_params,
+        "lang_list": list(hparams.lang_list),
+        "add_blank": bool(hparams.add_blank),
+    }
+
+
+class ShardedFeatureDataset(torch.utils.data.Dataset):
+    """
+    Serves `TextAudioSpeakerLoader` items from shards written by
+    `dmtts.train.pack_features`, so an epoch reads a few large files instead of
+    one wav and one spec file per utterance.
+
+    Each shard stores, back to back for all of its items:
+      <name>.spec.f16   spectrograms [C, T], float16
+      <name>.wav.i16    waveforms, int16
+      <name>.text.i16   encoded phones / tones / language ids [3, L], int16
+      <name>.index.npy  one row of `SHARD_INDEX_COLUMNS` per item
+    The arrays are memory-mapped (per DataLoader worker) and spectrograms are
+    returned as float16 views of the map; `TextAudioSpeakerCollate` casts them
+    while padding. `lengths` are the exact frame counts, for
+    `DistributedBucketSampler`.
+    """
+
+    def __init__(self, shard_dir, hparams=None):
+        self.shard_dir = shard_dir
+        with open(os.path.join(shard_dir, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if hparams is not None:
+            expected = shard_meta(hparams, SpectrogramCache(hparams).params)
+            for key, value in expected.items():
+                if self.meta.get(key) != value:
+                    raise ValueError(f"{shard_dir} was packed with {key}={self.meta.get(key)}, config has {value}; re-run pack_features")
+        self.n_channels = self.meta["n_channels"]
+
+        self.shards = [shard["name"] for shard in self.meta["shards"]]
+        indices = [np.load(os.path.join(shard_dir, name + ".index.npy")) for name in self.shards]
+        self.indices = indices
+        self.items = [(s, i) for s, index in enumerate(indices) for i in range(len(index))]
+        self.lengths = [int(index[i, 1]) for index in indices for i in range(len(index))]
+        self._maps = None
+
+    def _open(self):
+        # opened lazily so every DataLoader worker maps the files itself;
+        # copy-on-write maps give writable (never written) arrays for torch.from_numpy
+        def open_map(name, ext, dtype):
+            path = os.path.join(self.shard_dir, name + ext)
+            if os.path.getsize(path) == 0:
+                return np.zeros(0, dtype=dtype)
+            return np.memmap(path, dtype=dtype, mode="c")
+
+        self._maps = [
+            (open_map(name, ".spec.f16", np.float16), open_map(name, ".wav.i16", np.int16), open_map(name, ".text.i16", np.int16))
+            for name in self.shards
+        ]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_maps"] = None
+        return state
+
+    def __getitem__(self, index):
+        if self._maps is None:
+            self._open()
+        shard, i = self.items[index]
+        spec_offset, frames, wav_offset, samples, text_offset, text_len, sid = (int(v) for v in self.indices[shard][i])
+        spec_map, wav_map, text_map = self._maps[shard]
+
+        spec = torch.from_numpy(spec_map[spec_offset:spec_offset + self.n_channels * frames].reshape(self.n_channels, frames))
+        wav = torch.from_numpy(wav_map[wav_offset:wav_offset + samples]).float().div_(32768.0).unsqueeze(0)
+        text = torch.from_numpy(text_map[text_offset:text_offset + 3 * text_len].reshape(3, text_len)).long()
+        phones, tone, language = text[0], text[1], text[2]
+        return (phones, spec, wav, torch.LongTensor([sid]), tone, language)
+
+    def __len__(self):
+        return len(self.items)
+
+
 class TextAudioSpeakerCollate:
     """Zero-pads model inputs and targets"""
 
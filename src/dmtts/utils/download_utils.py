@@ -1,8 +1,17 @@
+import json
+import math
+import pickle
+import struct
 import torch
 import os
 from dmtts.utils import hparam_utils as utils
 from cached_path import cached_path
-from huggingface_hub import hf_hub_download
+from huggingface_hub import hf_hub_download, try_to_load_from_cache
+from safetensors import safe_open
+from safetensors.torch import load_file
+
+# inference-only checkpoint written by `python -m dmtts.train.export_checkpoint`
+INFERENCE_CKPT_NAME = "model.safetensors"
 
 LANG_TO_HF_REPO_ID = {
     'EN': 'kijoongkwon99/DMTTSv2-English',
@@ -147,6 +156,54 @@ def load_or_download_model_orig(locale, device, use_hf=True, ckpt_path=None, loc
     return torch.load(ckpt_path, map_location=device)
 
 
+def local_checkpoint_path(base_path, skip_snap_seed=True):
+    """model.safetensors or checkpoint.pth of a local model repo (see `load_or_download_model`)."""
+    # ✅ skip_snap_seed=True일 경우: snapshots/<hash> 자동 탐색
+    if skip_snap_seed:
+        snapshots_dir = os.path.join(base_path, "snapshots")
+        if not os.path.isdir(snapshots_dir):
+            raise FileNotFoundError(f"'snapshots' directory not found in {base_path}")
+
+        subdirs = [
+            d for d in os.listdir(snapshots_dir)
+            if os.path.isdir(os.path.join(snapshots_dir, d))
+        ]
+        if not subdirs:
+            raise FileNotFoundError(f"No snapshot subdirectories found in {snapshots_dir}")
+
+        # 첫 번째 hash 폴더 선택
+        base_path = os.path.join(snapshots_dir, subdirs[0])
+        print(f"[INFO] Auto-selected snapshot dir: {base_path}")
+
+    # model.safetensors(추론 전용)가 있으면 우선, 없으면 checkpoint.pth
+    ckpt_path = os.path.join(base_path, INFERENCE_CKPT_NAME)
+    if not os.path.exists(ckpt_path):
+        ckpt_path = os.path.join(base_path, "checkpoint.pth")
+    if not os.path.exists(ckpt_path):
+        raise FileNotFoundError(f"checkpoint.pth not found in {base_path}")
+    return ckpt_path
+
+
+def find_checkpoint(locale, use_hf=True, ckpt_path=None, local_repo_path_dict=None, skip_snap_seed=True):
+    """
+    Path of the checkpoint `load_or_download_model` would load, if it is already
+    on disk (nothing is downloaded), else None.
+    """
+    language = locale.split('-')[0].upper()
+    if ckpt_path is not None:
+        return ckpt_path if os.path.exists(ckpt_path) else None
+    if use_hf and language in LANG_TO_HF_REPO_ID:
+        cached = try_to_load_from_cache(LANG_TO_HF_REPO_ID[language], "checkpoint.pth")
+        if isinstance(cached, str):
+            return cached
+    if local_repo_path_dict is not None and language in local_repo_path_dict:
+        try:
+            return local_checkpoint_path(local_repo_path_dict[language], skip_snap_seed)
+        except FileNotFoundError:
+            return None
+    return None
+
+
 def load_or_download_model(
     locale,
     device,
@@ -162,7 +219,7 @@ def load_or_download_model(
     if ckpt_path is not None:
         if not os.path.exists(ckpt_path):
             raise FileNotFoundError(f"Checkpoint not found at: {ckpt_path}")
-        return torch.load(ckpt_path, map_location=device)
+        return load_checkpoint_file(ckpt_path, device)
 
     # ② Hugging Face에서 받는 경우
     if use_hf:
@@ -183,33 +240,78 @@ def load_or_download_model(
         assert language in local_repo_path_dict, \
             f"{language} not found in local_repo_path_dict"
 
-        base_path = local_repo_path_dict[language]
+        ckpt_path = local_checkpoint_path(local_repo_path_dict[language], skip_snap_seed)
 
-        # ✅ skip_snap_seed=True일 경우: snapshots/<hash> 자동 탐색
-        if skip_snap_seed:
-            snapshots_dir = os.path.join(base_path, "snapshots")
-            if not os.path.isdir(snapshots_dir):
-                raise FileNotFoundError(f"'snapshots' directory not found in {base_path}")
+    # ④ 모델 로드
+    print(f"[INFO] Loading model from: {ckpt_path}")
+    return load_checkpoint_file(ckpt_path, device)
 
-            subdirs = [
-                d for d in os.listdir(snapshots_dir)
-                if os.path.isdir(os.path.join(snapshots_dir, d))
-            ]
-            if not subdirs:
-                raise FileNotFoundError(f"No snapshot subdirectories found in {snapshots_dir}")
 
-            # 첫 번째 hash 폴더 선택
-            base_path = os.path.join(snapshots_dir, subdirs[0])
-            print(f"[INFO] Auto-selected snapshot dir: {base_path}")
+def load_checkpoint_file(ckpt_path, device):
+    """
+    Returns a checkpoint dict with the generator state under "model".
 
-        # checkpoint.pth 확인
-        ckpt_path = os.path.join(base_path, "checkpoint.pth")
-        if not os.path.exists(ckpt_path):
-            raise FileNotFoundError(f"checkpoint.pth not found in {base_path}")
+    Training checkpoints (*.pth) are unpickled with torch.load. Inference-only
+    *.safetensors checkpoints are memory-mapped: on CPU the returned tensors share
+    pages with the file (copy-on-write), so nothing is read until it is used and
+    the page cache is shared between processes loading the same file.
+    Those dicts also carry "inference_only": True and the file metadata.
+    """
+    if not ckpt_path.endswith(".safetensors"):
+        return torch.load(ckpt_path, map_location=device)
+    with safe_open(ckpt_path, framework="pt") as f:
+        metadata = f.metadata() or {}
+    return {
+        "model": load_file(ckpt_path, device=str(device)),
+        "inference_only": True,
+        "metadata": metadata,
+    }
+
+
+# safetensors dtype tag -> bytes per element, see `checkpoint_model_nbytes`
+SAFETENSORS_DTYPE_SIZES = {
+    "F64": 8, "F32": 4, "F16": 2, "BF16": 2, "F8_E4M3": 1, "F8_E5M2": 1,
+    "I64": 8, "I32": 4, "I16": 2, "I8": 1, "U8": 1, "BOOL": 1,
+}
 
-    # ④ 모델 로드
-    print(f"[INFO] Loading model from: {ckpt_path}")
-    return torch.load(ckpt_path, map_location=device)
+
+def checkpoint_model_nbytes(ckpt_path, dtype=None, exclude=()):
+    """
+    Bytes the generator state of a checkpoint takes once loaded (what
+    `registry.model_nbytes` counts), without reading the weights: the tensor
+    sizes from the *.safetensors header, or of the "model" entry of a *.pth
+    (memory-mapped, so the optimizer state next to it is never read).
+    Floating point tensors are counted at the size of `dtype` if given; keys
+    starting with one of `exclude` are skipped. None if it cannot be determined.
+    """
+    float_size = torch.empty((), dtype=dtype).element_size() if dtype is not None else None
+    if ckpt_path.endswith(".safetensors"):
+        with open(ckpt_path, "rb") as f:
+            (header_len,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_len))
+        total = 0
+        for key, info in header.items():
+            if key == "__metadata__" or key.startswith(tuple(exclude)):
+                continue
+            size = SAFETENSORS_DTYPE_SIZES.get(info["dtype"])
+            if size is None:
+                return None
+            if float_size is not None and info["dtype"].startswith(("F", "BF")):
+                size = float_size
+            total += math.prod(info["shape"]) * size
+        return total
+    try:
+        state_dict = torch.load(ckpt_path, map_location="cpu", mmap=True, weights_only=True)["model"]
+    except (RuntimeError, KeyError, TypeError, pickle.UnpicklingError):
+        # legacy (non-zip) files cannot be memory-mapped
+        return None
+    total = 0
+    for key, t in state_dict.items():
+        if not torch.is_tensor(t) or key.startswith(tuple(exclude)):
+            continue
+        size = float_size if float_size is not None and t.is_floating_point() else t.element_size()
+        total += t.numel() * size
+    return total
 
 
 
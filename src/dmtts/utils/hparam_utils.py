@@ -12,6 +12,7 @@ import librosa
 from dmtts.model.text.symbols import cleaned_text_to_sequence
 from dmtts.model.text.cleaner import clean_text
 from dmtts.model import commons
+from dmtts.utils.profile_utils import stage
 
 MATPLOTLIB_FLAG = False
 
@@ -19,23 +20,27 @@ logger = logging.getLogger(__name__)
 
 
 
-def get_text_for_tts_infer(text, language_str, hps, device, lang_list=None):
+def get_text_for_tts_infer(text, language_str, hps, device, lang_list=None, encoder=None):
     #print(f"lang_list   :{lang_list}")
 
     norm_text, phone, tone = clean_text(text, language_str)
     # print(f"norm_text   :{norm_text}")
     # print(f"phone       :{phone}")
     # print(f"tone        :{tone}")
-    phone, tone, language = cleaned_text_to_sequence(phone, tone, language_str, lang_list=lang_list)
-
-    if hps.data.add_blank:
-        phone = commons.intersperse(phone, 0)
-        tone = commons.intersperse(tone, 0)
-        language = commons.intersperse(language, 0)
-
-    phone = torch.LongTensor(phone)
-    tone = torch.LongTensor(tone)
-    language = torch.LongTensor(language)
+    with stage("cleaned_text_to_sequence"):
+        if encoder is not None:
+            phone, tone, language = encoder.encode(phone, tone, language_str)
+        else:
+            phone, tone, language = cleaned_text_to_sequence(phone, tone, language_str, lang_list=lang_list)
+
+        if hps.data.add_blank:
+            phone = commons.intersperse(phone, 0)
+            tone = commons.intersperse(tone, 0)
+            language = commons.intersperse(language, 0)
+
+        phone = torch.LongTensor(phone)
+        tone = torch.LongTensor(tone)
+        language = torch.LongTensor(language)
     return phone, tone, language
 
 
@@ -0,0 +1,242 @@
+import time
+import random
+import logging
+import contextlib
+import contextvars
+from collections import defaultdict
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+# the profile of the request running in this thread / task (None = profiling off)
+_current = contextvars.ContextVar("dmtts_profile", default=None)
+_NULL = contextlib.nullcontext()
+
+STAGES = (
+    "split_sentence",
+    "text_normalize",
+    "g2p",
+    "cleaned_text_to_sequence",
+    "enc_p",
+    "duration",
+    "generate_path",
+    "flow",
+    "dec",
+)
+
+
+def stage(name):
+    """
+    `with stage("enc_p"): ...` adds the block's wall time to the active profile.
+    Without one it returns a shared null context, so call sites can stay in the
+    hot path unconditionally.
+    """
+    profile = _current.get()
+    if profile is None:
+        return _NULL
+    return profile.stage(name)
+
+
+def current_profile():
+    return _current.get()
+
+
+class _Stage:
+    __slots__ = ("profile", "name", "start")
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.profile._sync()
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.profile._sync()
+        self.profile._add(self.name, time.perf_counter() - self.start)
+
+
+class InferenceProfile:
+    """
+    Wall time per stage (see `STAGES`) and per sentence for one or more `TTS`
+    calls, plus phone / frame / sample counts and the real-time factor
+    (processing time / audio duration, < 1 is faster than real time).
+
+    GPU kernels run asynchronously, so with `synchronize=True` every stage
+    boundary waits for the device; leave it off for cheap, CPU-side timings.
+    """
+
+    def __init__(self, sampling_rate, synchronize=False):
+        self.sampling_rate = sampling_rate
+        self.synchronize = synchronize and torch.cuda.is_available()
+        self.sentences = []
+        self.batches = []
+        self.stages = defaultdict(float)
+        self._open = []
+        self._pending = []
+        self.wall = 0.
+
+    def _sync(self):
+        if self.synchronize:
+            torch.cuda.synchronize()
+
+    def _add(self, name, elapsed):
+        self.stages[name] += elapsed
+        for record in self._open:
+            record["stages"][name] = record["stages"].get(name, 0.) + elapsed
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    @contextlib.contextmanager
+    def activate(self):
+        token = _current.set(self)
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.wall += time.perf_counter() - start
+            _current.reset(token)
+
+    def begin_sentence(self, text):
+        """Opens a sentence record; stages run until `end_frontend` are added to it."""
+        record = {"index": len(self.sentences), "chars": len(text), "stages": {}}
+        self.sentences.append(record)
+        self._open_record(record)
+        return record
+
+    def end_frontend(self, record, phones):
+        record["frontend"] = self._close_record(record)
+        record["phones"] = int(phones)
+        self._pending.append(record)
+
+    def take_pending(self, n, phones=None):
+        """Sentence records whose inputs are about to go through the model, oldest
+        first. Inputs prepared outside this profile (e.g. by the server's frontend
+        thread) get new records without a frontend time if their phone counts are
+        given, else None."""
+        if len(self._pending) < n:
+            if phones is None:
+                return None
+            records = [
+                {"index": len(self.sentences) + i, "phones": int(p), "stages": {}}
+                for i, p in enumerate(phones)
+            ]
+            self.sentences.extend(records)
+            return records
+        records, self._pending = self._pending[:n], self._pending[n:]
+        return records
+
+    def begin_model(self, records):
+        """Model stages of a single sentence go to its record; those of a padded
+        call are shared by its rows and kept in a batch record instead."""
+        if len(records) == 1:
+            handle = records[0]
+        else:
+            handle = {"index": len(self.batches), "size": len(records), "stages": {}}
+            self.batches.append(handle)
+            for record in records:
+                record["batch"] = handle["index"]
+        self._open_record(handle)
+        return handle
+
+    def end_model(self, handle, records, frames, samples):
+        handle["model"] = self._close_record(handle)
+        for record, n_frames, n_samples in zip(records, frames, samples):
+            record["frames"] = int(n_frames)
+            record["samples"] = int(n_samples)
+            record["audio"] = n_samples / self.sampling_rate
+            if "batch" not in record and n_samples:
+                record["rtf"] = (record.get("frontend", 0.) + record["model"]) / record["audio"]
+
+    def _open_record(self, record):
+        record["_start"] = time.perf_counter()
+        self._open.append(record)
+
+    def _close_record(self, record):
+        self._open = [r for r in self._open if r is not record]
+        return time.perf_counter() - record.pop("_start")
+
+    def as_dict(self):
+        phones = sum(r.get("phones", 0) for r in self.sentences)
+        frames = sum(r.get("frames", 0) for r in self.sentences)
+        samples = sum(r.get("samples", 0) for r in self.sentences)
+        audio = samples / self.sampling_rate
+        return {
+            "wall": self.wall,
+            "audio": audio,
+            "rtf": self.wall / audio if audio else None,
+            "phones": phones,
+            "frames": frames,
+            "samples": samples,
+            "stages": {name: self.stages[name] for name in STAGES if name in self.stages},
+            "sentences": [dict(r, stages=dict(r["stages"])) for r in self.sentences],
+            "batches": [dict(b, stages=dict(b["stages"])) for b in self.batches],
+        }
+
+    def log(self, log=None):
+        log = log or logger
+        d = self.as_dict()
+        stages = " ".join(f"{k}={v * 1000:.1f}ms" for k, v in d["stages"].items())
+        rtf = f"{d['rtf']:.3f}" if d["rtf"] is not None else "-"
+        log.info(f"tts profile: wall={d['wall'] * 1000:.1f}ms audio={d['audio']:.2f}s rtf={rtf} phones={d['phones']} frames={d['frames']} {stages}")
+        for r in d["sentences"]:
+            stages = " ".join(f"{k}={v * 1000:.1f}ms" for k, v in r["stages"].items())
+            rtf = f"{r['rtf']:.3f}" if r.get("rtf") is not None else "-"
+            log.info(f"  sentence {r['index']}: phones={r.get('phones')} frames={r.get('frames')} samples={r.get('samples')} rtf={rtf} {stages}")
+        for b in d["batches"]:
+            stages = " ".join(f"{k}={v * 1000:.1f}ms" for k, v in b["stages"].items())
+            log.info(f"  batch {b['index']} ({b['size']} sentences): {stages}")
+        return d
+
+
+class ProfileSampler:
+    """Profiles a random `sample_rate` fraction of calls and hands each finished
+    profile to `callback` (default: log it)."""
+
+    def __init__(self, sampling_rate, sample_rate=1.0, callback=None, synchronize=False):
+        self.sampling_rate = sampling_rate
+        self.sample_rate = sample_rate
+        self.callback = callback
+        self.synchronize = synchronize
+
+    @contextlib.contextmanager
+    def maybe_profile(self):
+        # nested calls (tts_to_file -> infer_batch ...) join the outer profile
+        if _current.get() is not None or random.random() >= self.sample_rate:
+            yield None
+            return
+        profile = InferenceProfile(self.sampling_rate, synchronize=self.synchronize)
+        with profile.activate():
+            yield profile
+        self._report(profile)
+
+    def profile_iter(self, iterator):
+        """
+        `maybe_profile` for a generator: the profile is active only while
+        `iterator` produces its next item (not while the consumer holds it), and
+        is reported once the iterator is exhausted or the generator is closed.
+        """
+        if _current.get() is not None or random.random() >= self.sample_rate:
+            yield from iterator
+            return
+        profile = InferenceProfile(self.sampling_rate, synchronize=self.synchronize)
+        try:
+            while True:
+                with profile.activate():
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                yield item
+        finally:
+            iterator.close()
+            self._report(profile)
+
+    def _report(self, profile):
+        if self.callback is not None:
+            self.callback(profile.as_dict())
+        else:
+            profile.log()